@@ -4,6 +4,8 @@ from newspaper import Article
 from newspaper import Config
 import lxml.html
 
+import db
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -86,7 +88,8 @@ def backfill_content():
                 html_content = article.text
             
             if html_content:
-                cursor.execute("UPDATE articles SET content = ? WHERE id = ?", (html_content, article_id))
+                cursor.execute("UPDATE articles SET content = ?, content_text = ? WHERE id = ?",
+                               (html_content, db.content_text(html_content), article_id))
                 conn.commit()
                 updated += 1
             
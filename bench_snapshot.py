@@ -0,0 +1,110 @@
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import db
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING)
+
+WORDS = ("market court election model launch storm policy energy study league museum vaccine "
+         "budget startup climate ruling senate chip satellite festival").split()
+
+def fake_article(i, content_chars):
+    rng = random.Random(i)
+    body = " ".join(rng.choice(WORDS) for _ in range(content_chars // 7))
+    domain = f"news{i % 300}.example.com"
+    return {
+        'feed_entry_id': f"entry-{i // 20}",
+        'email_source': f"Newsletter {i % 12}",
+        'article_source_domain': domain,
+        'title': " ".join(rng.choice(WORDS) for _ in range(8)).title(),
+        'content': f"<div><p>{body}</p></div>",
+        'summary': " ".join(rng.choice(WORDS) for _ in range(40)),
+        'tags': ",".join(rng.sample(WORDS, 3)),
+        'image_url': f"https://{domain}/img/{i}.jpg",
+        'original_link': f"https://{domain}/story/{i}",
+        'content_hash': f"{i:064x}",
+        'published_date': "2026-01-01T00:00:00",
+        'feed_source_date': "2026-01-01T00:00:00",
+        'author': "Staff",
+        'reading_time': 3,
+        'prompt_tokens': 700,
+    }
+
+def populate(path, start, count, content_chars):
+    """Inserts articles (with their entries, sources and some failed crawls) straight into the database."""
+    conn = sqlite3.connect(path)
+    columns = list(fake_article(0, 10))
+    conn.executemany(
+        f"INSERT INTO articles ({','.join(columns)}) VALUES ({','.join('?' for _ in columns)})",
+        ([a[c] for c in columns] for a in (fake_article(i, content_chars) for i in range(start, start + count)))
+    )
+    conn.executemany("INSERT OR IGNORE INTO entries (entry_id) VALUES (?)",
+                     ((f"entry-{i // 20}",) for i in range(start, start + count)))
+    conn.executemany("INSERT OR IGNORE INTO article_sources (original_link, source_name, feed_entry_id) VALUES (?, ?, ?)",
+                     ((f"https://news{i % 300}.example.com/story/{i}", "default", f"entry-{i // 20}")
+                      for i in range(start, start + count)))
+    conn.executemany("INSERT OR REPLACE INTO failed_crawls (url, error_code) VALUES (?, ?)",
+                     ((f"https://bad.example.com/{i}", "403") for i in range(start, start + count, 10)))
+    conn.commit()
+    conn.close()
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def timed(label, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    print(f"{label:32}{time.perf_counter() - started:8.2f}s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot export and import on a synthetic archive.")
+    parser.add_argument("--articles", type=int, default=50000)
+    parser.add_argument("--content-chars", type=int, default=6000)
+    parser.add_argument("--increment", type=int, default=100, help="Articles added between the two exports")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_snapshot-")
+    try:
+        source_db = os.path.join(work, "source.db")
+        rebuilt_db = os.path.join(work, "rebuilt.db")
+        snapshot_dir = os.path.join(work, "snapshot")
+
+        db.init_db(source_db)
+        timed(f"populate {args.articles} articles", populate, source_db, 0, args.articles, args.content_chars)
+        conn = sqlite3.connect(source_db)
+        conn.execute("VACUUM")
+        conn.close()
+
+        timed("full export", db.export_snapshot, snapshot_dir, source_db, "2026-01")
+        full_size = dir_size(snapshot_dir)
+
+        populate(source_db, args.articles, args.increment, args.content_chars)
+        before = dir_size(snapshot_dir)
+        timed(f"incremental export (+{args.increment})", db.export_snapshot, snapshot_dir, source_db, "2026-01")
+        increment_size = dir_size(snapshot_dir) - before
+
+        loaded = timed("import (rebuild database)", db.import_snapshot, snapshot_dir, rebuilt_db)
+
+        print(f"{'articles.db size':32}{os.path.getsize(source_db) / 1e6:8.1f} MB")
+        print(f"{'snapshot size':32}{full_size / 1e6:8.1f} MB")
+        print(f"{'bytes appended per increment':32}{increment_size / 1e3:8.1f} KB")
+        print(f"Rows loaded: {loaded}")
+
+        conn = sqlite3.connect(rebuilt_db)
+        hits = conn.execute("SELECT count(*) FROM articles_fts WHERE articles_fts MATCH 'senate'").fetchone()[0]
+        check = conn.execute("SELECT count(*) FROM articles").fetchone()[0]
+        conn.close()
+        print(f"Rebuilt database: {check} articles, {hits} full-text hits for 'senate'")
+    finally:
+        shutil.rmtree(work)
+
+if __name__ == "__main__":
+    main()
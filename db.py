@@ -1,14 +1,53 @@
 import sqlite3
+import gzip
+import json
 import logging
-from datetime import datetime
+import os
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import snippet
 
 logger = logging.getLogger(__name__)
 
 DB_PATH = "articles.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+# Seconds a connection waits for another worker's write lock before failing
+BUSY_TIMEOUT = 30
+
+# Source name that articles stored before multi-source support are attributed to
+LEGACY_SOURCE_NAME = "default"
+
+# Text snapshot of the database that is committed instead of articles.db (see export_snapshot)
+SNAPSHOT_DIR = "snapshot"
+SNAPSHOT_MANIFEST = "manifest.json"
+SNAPSHOT_JOBS = "jobs.jsonl.gz"
+# Tables exported as append-only changesets, with the increasing key used as the export watermark
+SNAPSHOT_TABLES = [
+    ("entries", "rowid"),
+    ("articles", "id"),
+    ("failed_crawls", "rowid"),
+    ("article_sources", "rowid"),
+    ("runs", "id"),
+]
+# Columns derived from others, left out of the snapshot and recomputed on import
+SNAPSHOT_DERIVED_COLUMNS = {"articles": ("content_text",)}
+# Finished jobs kept per stage in the snapshot, so stage cost estimates survive a rebuild
+SNAPSHOT_DONE_JOBS = 200
+# Unfinished jobs kept in the snapshot, highest priority first
+SNAPSHOT_MAX_JOBS = 5000
+SNAPSHOT_BATCH = 5000
+# zlib level 6 compresses nearly as well as 9 at a fraction of the export time
+SNAPSHOT_COMPRESSLEVEL = 6
+
+def init_db(path=None):
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
+
+    # WAL lets pipeline workers in several threads/processes read while one writes
+    cursor.execute("PRAGMA journal_mode=WAL")
     
     # Table to track processed feed entries to avoid re-processing
     cursor.execute('''
@@ -53,6 +92,32 @@ def init_db():
     # Ensure index on url for fast lookups (though PRIMARY KEY implies it, explicit index ensures intent)
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_failed_url ON failed_crawls(url)')
 
+    # Which configured sources (newsletter inboxes) linked each article.
+    # Articles are stored and crawled once; this table fans them out to per-source feeds.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_sources'")
+    article_sources_exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_sources (
+            original_link TEXT,
+            source_name TEXT,
+            feed_entry_id TEXT,
+            linked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (original_link, source_name)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_sources_source ON article_sources(source_name)')
+    if not article_sources_exists:
+        cursor.execute('''
+            INSERT OR IGNORE INTO article_sources (original_link, source_name, feed_entry_id)
+            SELECT original_link, ?, feed_entry_id FROM articles
+        ''', (LEGACY_SOURCE_NAME,))
+
+    # Indexes backing the domain and date filters of search_articles
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_domain ON articles(article_source_domain)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_crawl_date ON articles(crawl_date)')
+    # Content-hash dedup runs for every crawled URL across all sources
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_content_hash ON articles(content_hash)')
+
     # Simple migration: Add feed_source_date if it doesn't exist
     try:
         cursor.execute("ALTER TABLE articles ADD COLUMN feed_source_date TEXT")
@@ -68,14 +133,142 @@ def init_db():
         cursor.execute("ALTER TABLE articles ADD COLUMN reading_time INTEGER")
     except sqlite3.OperationalError:
         pass
+
+    # Simple migration: Add prompt_tokens (size of the Gemini prompt) if it doesn't exist
+    try:
+        cursor.execute("ALTER TABLE articles ADD COLUMN prompt_tokens INTEGER")
+    except sqlite3.OperationalError:
+        pass
+
+    # Migration: plain text of content, which is what the search index covers
+    try:
+        cursor.execute("ALTER TABLE articles ADD COLUMN content_text TEXT")
+    except sqlite3.OperationalError:
+        pass
     
+    init_search_index(cursor)
+    init_job_queue(cursor)
+
     conn.commit()
     conn.close()
-    logger.info(f"Database initialized at {DB_PATH}")
+    logger.info(f"Database initialized at {path}")
+
+def init_job_queue(cursor):
+    """
+    Creates the durable work queue connecting the pipeline stages (see jobqueue.py).
+    Times are unix timestamps so lease arithmetic stays in Python.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            job_key TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            priority REAL NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            available_at REAL NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            heartbeat_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at REAL,
+            finished_at REAL,
+            UNIQUE (stage, job_key)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, stage)')
+
+    # Migration: claim time, so per-stage costs can be measured
+    try:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN started_at REAL")
+    except sqlite3.OperationalError:
+        pass
+
+    # One row per budgeted run, used to size the time reserved for publishing
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL,
+            budget REAL,
+            jobs_completed INTEGER,
+            jobs_deferred INTEGER,
+            publish_seconds REAL
+        )
+    ''')
+
+def init_search_index(cursor):
+    """
+    Creates the FTS5 index over articles and the triggers keeping it in sync.
+    The index is an external-content table reading articles.content_text, the
+    plain text of the stored HTML, so markup and link URLs are not searchable.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'")
+    exists = cursor.fetchone() is not None
+    if exists and "content_text" not in {row[1] for row in cursor.execute("PRAGMA table_info(articles_fts)")}:
+        # Index from before content_text: it covered the raw HTML
+        for trigger in ("articles_fts_insert", "articles_fts_delete", "articles_fts_update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE articles_fts")
+        exists = False
+    if not exists:
+        fill_content_text(cursor)
+
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, summary, tags, author, content_text,
+            content='articles', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title, summary, tags, author, content_text)
+            VALUES (new.id, new.title, new.summary, new.tags, new.author, new.content_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, tags, author, content_text)
+            VALUES ('delete', old.id, old.title, old.summary, old.tags, old.author, old.content_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, tags, author, content_text)
+            VALUES ('delete', old.id, old.title, old.summary, old.tags, old.author, old.content_text);
+            INSERT INTO articles_fts (rowid, title, summary, tags, author, content_text)
+            VALUES (new.id, new.title, new.summary, new.tags, new.author, new.content_text);
+        END
+    ''')
+
+    if not exists:
+        # First run against an existing archive: index the rows already stored
+        cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        logger.info("Built full-text search index over existing articles")
+
+def content_text(html):
+    """Plain text of stored article HTML, as indexed for search."""
+    try:
+        return " ".join(snippet.html_to_text(html).split())
+    except Exception:
+        # Not parseable as HTML (e.g. the plain-text fallback): index it as is
+        return html or ""
+
+def fill_content_text(cursor):
+    """Derives content_text for articles stored without it (older rows, snapshot imports)."""
+    rows = cursor.execute("SELECT id, content FROM articles WHERE content_text IS NULL").fetchall()
+    cursor.executemany("UPDATE articles SET content_text = ? WHERE id = ?",
+                       ((content_text(content), article_id) for article_id, content in rows))
+    if rows:
+        logger.info(f"Derived plain text for {len(rows)} articles")
 
 def is_crawl_failed(url):
     """Check if a URL has previously failed crawling."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     # Efficient lookup using the index/primary key
     cursor.execute("SELECT 1 FROM failed_crawls WHERE url = ?", (url,))
@@ -85,7 +278,7 @@ def is_crawl_failed(url):
 
 def mark_crawl_failed(url, error_code):
     """Mark a URL as failed to prevent retries."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     cursor.execute(
         "INSERT OR REPLACE INTO failed_crawls (url, error_code) VALUES (?, ?)", 
@@ -95,7 +288,7 @@ def mark_crawl_failed(url, error_code):
     conn.close()
 
 def entry_exists(entry_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     cursor.execute("SELECT 1 FROM entries WHERE entry_id = ?", (entry_id,))
     exists = cursor.fetchone() is not None
@@ -103,7 +296,7 @@ def entry_exists(entry_id):
     return exists
 
 def article_exists(url=None, content_hash=None):
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     exists = False
     
@@ -120,15 +313,59 @@ def article_exists(url=None, content_hash=None):
     conn.close()
     return exists
 
+def find_article_link(content_hash):
+    """Returns the original_link of the article stored with this content hash, if any."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute("SELECT original_link FROM articles WHERE content_hash = ? LIMIT 1", (content_hash,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def copy_article_sources(from_url, to_url):
+    """Gives to_url every source link recorded for from_url (used when from_url turns out to be a duplicate)."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR IGNORE INTO article_sources (original_link, source_name, feed_entry_id)
+        SELECT ?, source_name, feed_entry_id FROM article_sources WHERE original_link = ?
+    ''', (to_url, from_url))
+    conn.commit()
+    conn.close()
+
+def get_domain_outcomes():
+    """Returns {domain: [articles stored, crawls failed]} from past runs."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute("SELECT article_source_domain, count(*) FROM articles GROUP BY article_source_domain")
+    outcomes = {domain: [count, 0] for domain, count in cursor.fetchall() if domain}
+    cursor.execute("SELECT url FROM failed_crawls")
+    for (url,) in cursor.fetchall():
+        domain = urlparse(url).netloc
+        outcomes.setdefault(domain, [0, 0])[1] += 1
+    conn.close()
+    return outcomes
+
+def link_article_source(url, source_name, entry_id=None):
+    """Records that a source linked an (already stored) article, so it shows up in that source's feed."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT OR IGNORE INTO article_sources (original_link, source_name, feed_entry_id) VALUES (?, ?, ?)",
+        (url, source_name, entry_id)
+    )
+    conn.commit()
+    conn.close()
+
 def mark_entry_processed(entry_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     cursor.execute("INSERT OR IGNORE INTO entries (entry_id) VALUES (?)", (entry_id,))
     conn.commit()
     conn.close()
 
 def save_article(article_data):
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     try:
@@ -136,8 +373,8 @@ def save_article(article_data):
             INSERT INTO articles (
                 feed_entry_id, email_source, article_source_domain, title, 
                 content, summary, tags, image_url, original_link, content_hash, published_date, feed_source_date,
-                author, reading_time
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                author, reading_time, prompt_tokens, content_text
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             article_data.get('feed_entry_id'),
             article_data.get('email_source'),
@@ -152,7 +389,9 @@ def save_article(article_data):
             article_data.get('published_date'),
             article_data.get('feed_source_date'),
             article_data.get('author'),
-            article_data.get('reading_time')
+            article_data.get('reading_time'),
+            article_data.get('prompt_tokens'),
+            content_text(article_data.get('content'))
         ))
         conn.commit()
         logger.info(f"Saved article: {article_data.get('title')}")
@@ -162,7 +401,7 @@ def save_article(article_data):
         conn.close()
 
 def get_non_spam_articles(limit=50):
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -178,3 +417,381 @@ def get_non_spam_articles(limit=50):
     rows = cursor.fetchall()
     conn.close()
     return rows
+
+def get_feed_candidates(limit=2000):
+    """Returns the most recent non-spam articles, read once to publish every topic feed."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM articles
+        WHERE tags NOT LIKE '%spam%'
+        ORDER BY crawl_date DESC
+        LIMIT ?
+    ''', (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def get_source_feed_rows(limit=50, source_name=None):
+    """
+    Returns {source_name: rows} with each source's newest non-spam articles,
+    at most limit per source, however old they are relative to other sources.
+    With source_name, only that source's rows are read.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM (
+            SELECT a.*, s.source_name AS feed_source_name,
+                   row_number() OVER (PARTITION BY s.source_name ORDER BY a.crawl_date DESC) AS source_rank
+            FROM article_sources s
+            JOIN articles a ON a.original_link = s.original_link
+            WHERE a.tags NOT LIKE '%spam%' AND (? IS NULL OR s.source_name = ?)
+        )
+        WHERE source_rank <= ?
+        ORDER BY feed_source_name, source_rank
+    ''', (source_name, source_name, limit))
+    rows_by_source = {}
+    for row in cursor.fetchall():
+        rows_by_source.setdefault(row['feed_source_name'], []).append(row)
+    conn.close()
+    return rows_by_source
+
+def get_tag_names():
+    """Returns the set of (lowercased) tags used by non-spam articles."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT tags FROM articles WHERE tags NOT LIKE '%spam%'")
+    names = set()
+    for (tags,) in cursor.fetchall():
+        names.update(tag.strip().lower() for tag in (tags or '').split(',') if tag.strip())
+    conn.close()
+    return names
+
+def get_articles_version():
+    """
+    A value that changes whenever articles or their source links are added or
+    removed, and not when only the job queue is written to.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT (SELECT max(id) FROM articles), (SELECT count(*) FROM articles),
+               (SELECT max(rowid) FROM article_sources), (SELECT count(*) FROM article_sources)
+    """)
+    version = cursor.fetchone()
+    conn.close()
+    return version
+
+def _fts_phrase(text):
+    """Quotes text as a single FTS5 phrase so punctuation is not parsed as syntax."""
+    return '"' + text.replace('"', '""') + '"'
+
+def _build_match_query(query, tags=None, raw=False):
+    """
+    Builds an FTS5 MATCH expression from a free-text query and tag filters.
+    Unless raw is set, every query term is quoted so input like 'c++' or
+    'gpt-4' is searched literally instead of raising a syntax error.
+    """
+    parts = []
+    if query:
+        if raw:
+            parts.append(f"({query})")
+        else:
+            parts.extend(_fts_phrase(term) for term in query.split())
+    for tag in tags or []:
+        parts.append(f"tags : {_fts_phrase(tag)}")
+    return " AND ".join(parts)
+
+def search_articles(query=None, tags=None, domain=None, since=None, until=None,
+                    limit=50, order="rank", include_spam=False, raw=False):
+    """
+    Searches stored articles through the FTS5 index.
+
+    query is matched against title, summary, tags, author and content.
+    tags must all be present (exact, case-insensitive). domain matches
+    article_source_domain exactly. since/until are inclusive 'YYYY-MM-DD'
+    bounds on crawl_date. order is 'rank' (bm25, title weighted highest)
+    or 'recent' (crawl_date descending).
+
+    Returns sqlite3.Row objects with every article column plus 'rank' and
+    'snippet', so results can be passed straight to feed generation.
+    """
+    match = _build_match_query(query, tags, raw=raw)
+
+    conditions = []
+    params = []
+    if match:
+        conditions.append("articles_fts MATCH ?")
+        params.append(match)
+    for tag in tags or []:
+        # The FTS phrase narrows candidates; this keeps 'ai' from matching 'ai safety'
+        conditions.append("(',' || a.tags || ',') LIKE ?")
+        params.append(f"%,{tag},%")
+    if domain:
+        conditions.append("a.article_source_domain = ?")
+        params.append(domain)
+    if since:
+        conditions.append("a.crawl_date >= ?")
+        params.append(since)
+    if until:
+        conditions.append("a.crawl_date < date(?, '+1 day')")
+        params.append(until)
+    if not include_spam:
+        conditions.append("a.tags NOT LIKE '%spam%'")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if match:
+        order_by = "rank" if order == "rank" else "a.crawl_date DESC"
+        sql = f'''
+            SELECT a.*,
+                   bm25(articles_fts, 10.0, 5.0, 3.0, 2.0, 1.0) AS rank,
+                   snippet(articles_fts, -1, '[', ']', '...', 16) AS snippet
+            FROM articles_fts
+            JOIN articles a ON a.id = articles_fts.rowid
+            {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        '''
+    else:
+        # Filters only: served by the domain/crawl_date indexes, no ranking
+        sql = f'''
+            SELECT a.*, NULL AS rank, NULL AS snippet
+            FROM articles a
+            {where}
+            ORDER BY a.crawl_date DESC
+            LIMIT ?
+        '''
+    params.append(limit)
+
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return rows
+
+def _read_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def _gzip_lines(rows):
+    # mtime=0 keeps the bytes identical for identical rows
+    lines = "".join(json.dumps(dict(row), ensure_ascii=False, separators=(',', ':')) + "\n" for row in rows)
+    return gzip.compress(lines.encode('utf-8'), compresslevel=SNAPSHOT_COMPRESSLEVEL, mtime=0)
+
+def _job_seed(job):
+    """
+    An unfinished job reduced to what it takes to redo it, since payloads can
+    hold a whole email or page. Discover jobs keep the entry, to be fetched
+    again from its source; later stages go back to fetching their URL.
+    """
+    seed = dict(job)
+    payload = json.loads(seed['payload'] or 'null') or {}
+    if seed['stage'] == 'discover':
+        payload = {'entry_id': payload.get('entry_id'), 'source': payload.get('source')}
+    else:
+        seed['stage'] = 'fetch'
+        payload = {'url': payload.get('url', seed['job_key']), 'context': payload.get('context')}
+    seed.update(payload=json.dumps(payload), status='pending', attempts=0, available_at=0,
+                lease_owner=None, lease_expires=None, heartbeat_at=None, started_at=None)
+    return seed
+
+def export_snapshot(snapshot_dir=SNAPSHOT_DIR, path=None, period=None):
+    """
+    Appends rows added since the last export to the snapshot directory and
+    returns {table: rows exported}.
+
+    Each table has one changeset file per month (<table>/<YYYY-MM>.jsonl.gz).
+    Every export appends one gzip member to the current month's file, so
+    earlier bytes never change and git stores each new version as a small
+    delta. The manifest records the last exported key per table and the
+    committed size of each file. A file is cut back to that size before
+    appending, so an interrupted export leaves nothing behind. Pending jobs
+    are not history, so jobs.jsonl.gz is rewritten each time; it holds
+    recent finished jobs without payloads and at most SNAPSHOT_MAX_JOBS
+    unfinished ones as seeds (see _job_seed).
+
+    Only inserted rows are captured: in-place UPDATEs (backfill_content_html.py)
+    and DELETEs (reset_entry.py) do not reach the snapshot.
+    """
+    period = period or datetime.now(timezone.utc).strftime("%Y-%m")
+    manifest = _read_manifest(snapshot_dir) or {"version": 1, "watermarks": {}, "files": {}}
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    exported = {}
+    try:
+        for table, key in SNAPSHOT_TABLES:
+            watermark = manifest["watermarks"].get(table, 0)
+            select = f"SELECT rowid AS rowid, * FROM {table}" if key == "rowid" else f"SELECT * FROM {table}"
+            rows = conn.execute(f"{select} WHERE {key} > ? ORDER BY {key}", (watermark,)).fetchall()
+            exported[table] = len(rows)
+            if not rows:
+                continue
+            watermark = rows[-1][key]
+            derived = SNAPSHOT_DERIVED_COLUMNS.get(table, ())
+            if derived:
+                rows = [{name: row[name] for name in row.keys() if name not in derived} for row in rows]
+
+            relative = f"{table}/{period}.jsonl.gz"
+            file_path = os.path.join(snapshot_dir, relative)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'ab') as f:
+                f.truncate(manifest["files"].get(relative, 0))
+                f.write(_gzip_lines(rows))
+                f.flush()
+                os.fsync(f.fileno())
+                manifest["files"][relative] = f.tell()
+            manifest["watermarks"][table] = watermark
+
+        # Enough recent finished jobs for stage cost estimates, then the
+        # unfinished ones as seeds. Failed jobs are left out.
+        jobs = conn.execute('''
+            SELECT * FROM jobs WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (PARTITION BY stage ORDER BY finished_at DESC) AS recent
+                    FROM jobs WHERE status = 'done'
+                ) WHERE recent <= ?
+            )
+            ORDER BY id
+        ''', (SNAPSHOT_DONE_JOBS,)).fetchall()
+        unfinished = conn.execute(
+            "SELECT * FROM jobs WHERE status IN ('pending', 'running') ORDER BY priority DESC, id"
+        ).fetchall()
+        seeds = {}
+        for job in unfinished:
+            seed = _job_seed(job)
+            seeds.setdefault((seed['stage'], seed['job_key']), seed)
+        if len(seeds) > SNAPSHOT_MAX_JOBS:
+            logger.warning(f"Leaving {len(seeds) - SNAPSHOT_MAX_JOBS} lowest-priority unfinished jobs out of the snapshot")
+        jobs = [dict(job) for job in jobs] + list(seeds.values())[:SNAPSHOT_MAX_JOBS]
+        exported["jobs"] = len(jobs)
+    finally:
+        conn.close()
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    _write_atomic(os.path.join(snapshot_dir, SNAPSHOT_JOBS), _gzip_lines(jobs))
+    _write_atomic(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    logger.info(f"Exported snapshot to {snapshot_dir}: {exported}")
+    return exported
+
+def _read_changeset(file_path, size):
+    """Yields row dicts from a changeset file, ignoring bytes past its committed size."""
+    with open(file_path, 'rb') as f:
+        data = f.read(size)
+    for line in gzip.decompress(data).decode('utf-8').splitlines():
+        if line:
+            yield json.loads(line)
+
+def _load_rows(cursor, table, rows):
+    """Bulk-inserts row dicts, keeping only columns the current schema has."""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")} | {"rowid"}
+    loaded = 0
+    batch = []
+    batch_columns = None
+    for row in rows:
+        names = tuple(name for name in row if name in columns)
+        if names != batch_columns and batch:
+            _insert_batch(cursor, table, batch_columns, batch)
+            batch = []
+        batch_columns = names
+        batch.append(tuple(row[name] for name in names))
+        loaded += 1
+        if len(batch) >= SNAPSHOT_BATCH:
+            _insert_batch(cursor, table, batch_columns, batch)
+            batch = []
+    if batch:
+        _insert_batch(cursor, table, batch_columns, batch)
+    return loaded
+
+def _insert_batch(cursor, table, columns, batch):
+    placeholders = ",".join("?" for _ in columns)
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO {table} ({','.join(columns)}) VALUES ({placeholders})", batch
+    )
+
+def import_snapshot(snapshot_dir=SNAPSHOT_DIR, path=None):
+    """
+    Rebuilds the database at path from a snapshot directory and returns
+    {table: rows loaded}, or None if there is no snapshot.
+
+    The new database is built next to the target in a single transaction,
+    with journaling off and the full-text triggers dropped. The search index
+    is rebuilt once at the end, and the file is swapped in when complete.
+    Unfinished jobs come back as pending fetches of their URL; emails still
+    waiting for discovery are marked unprocessed, so the next run reads them
+    from their source feed again.
+    """
+    path = path or DB_PATH
+    manifest = _read_manifest(snapshot_dir)
+    if manifest is None:
+        logger.info(f"No snapshot found in {snapshot_dir}")
+        return None
+
+    build_path = path + ".import"
+    for stale in (build_path, build_path + "-wal", build_path + "-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    init_db(build_path)
+
+    conn = sqlite3.connect(build_path)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode=OFF")
+    cursor.execute("PRAGMA synchronous=OFF")
+    for trigger in ("articles_fts_insert", "articles_fts_delete", "articles_fts_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    loaded = {}
+    # Files sort chronologically by their period name
+    files = sorted(manifest["files"].items())
+    for table, _ in SNAPSHOT_TABLES:
+        changesets = (
+            row
+            for relative, size in files if relative.startswith(table + "/")
+            for row in _read_changeset(os.path.join(snapshot_dir, relative), size)
+        )
+        loaded[table] = _load_rows(cursor, table, changesets)
+
+    jobs_path = os.path.join(snapshot_dir, SNAPSHOT_JOBS)
+    if os.path.exists(jobs_path):
+        loaded["jobs"] = _load_rows(cursor, "jobs", _read_changeset(jobs_path, os.path.getsize(jobs_path)))
+        # Emails are not kept in the snapshot: drop their discover jobs and let seeding queue them again
+        cursor.execute('''
+            DELETE FROM entries WHERE entry_id IN (
+                SELECT json_extract(payload, '$.entry_id') FROM jobs WHERE stage = 'discover' AND status != 'done'
+            )
+        ''')
+        cursor.execute("DELETE FROM jobs WHERE stage = 'discover' AND status != 'done'")
+
+    fill_content_text(cursor)
+    cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+    init_search_index(cursor)
+    conn.commit()
+    conn.close()
+
+    # init_db switches the rebuilt file back to WAL on its next use
+    for stale in (path + "-wal", path + "-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    os.replace(build_path, path)
+    logger.info(f"Imported snapshot from {snapshot_dir} into {path}: {loaded}")
+    return loaded
@@ -0,0 +1,112 @@
+import argparse
+import logging
+import sqlite3
+import time
+from collections import Counter
+
+from lxml import etree
+
+import snippet
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# What process_feed sent before the snippet builder
+BASELINE_CHARS = 4000
+KEY_TERMS = 20
+CONTENT_NS = '{http://purl.org/rss/1.0/modules/content/}encoded'
+
+def load_feed_corpus(path):
+    """Reads (title, text, reference summary) from a generated feed such as output.xml."""
+    corpus = []
+    for item in etree.parse(path).iter('item'):
+        content = item.findtext(CONTENT_NS) or ""
+        # The stored article follows the summary block render_item prepends
+        article_html = content.split('<hr/>', 1)[-1]
+        summary_html = content.split('<hr/>', 1)[0] if '<hr/>' in content else ""
+        summary = snippet.html_to_text(summary_html).split('Source:')[0].replace('Summary:', '')
+        corpus.append((item.findtext('title'), snippet.html_to_text(article_html), summary.strip()))
+    return corpus
+
+def load_db_corpus(path, limit):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT title, content, summary FROM articles ORDER BY crawl_date DESC LIMIT ?", (limit,)
+    ).fetchall()
+    conn.close()
+    return [(title, snippet.html_to_text(content), summary or "") for title, content, summary in rows]
+
+def coverage(reference_words, candidate):
+    """Share of reference words that appear in the candidate text."""
+    if not reference_words:
+        return None
+    candidate_words = set(snippet.content_words(candidate))
+    return sum(1 for w in reference_words if w in candidate_words) / len(reference_words)
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else float('nan')
+
+def evaluate(corpus, budget):
+    stats = {key: [] for key in (
+        'baseline_tokens', 'snippet_tokens', 'baseline_terms', 'snippet_terms',
+        'baseline_summary', 'snippet_summary', 'build_ms'
+    )}
+    for title, text, summary in corpus:
+        if len(text.strip()) < 100:
+            continue
+        baseline = text[:BASELINE_CHARS]
+        started = time.perf_counter()
+        compressed = snippet.build_snippet(title, text, budget=budget)
+        stats['build_ms'].append((time.perf_counter() - started) * 1000)
+
+        key_terms = [w for w, _ in Counter(snippet.content_words(text)).most_common(KEY_TERMS)]
+        summary_words = set(snippet.content_words(summary))
+
+        stats['baseline_tokens'].append(snippet.estimate_tokens(baseline))
+        stats['snippet_tokens'].append(snippet.estimate_tokens(compressed))
+        stats['baseline_terms'].append(coverage(key_terms, baseline))
+        stats['snippet_terms'].append(coverage(key_terms, compressed))
+        stats['baseline_summary'].append(coverage(summary_words, baseline))
+        stats['snippet_summary'].append(coverage(summary_words, compressed))
+    return stats
+
+def compare_gemini(corpus, budget, count):
+    """Calls Gemini with both inputs for the first articles and prints the results side by side."""
+    import gemini
+    for title, text, _ in corpus[:count]:
+        for label, content in (("baseline", text[:BASELINE_CHARS]), ("snippet", snippet.build_snippet(title, text, budget=budget))):
+            started = time.perf_counter()
+            result = gemini.analyze_article(title, content)
+            elapsed = time.perf_counter() - started
+            print(f"[{label}] {title[:60]} | {result.get('prompt_tokens')} prompt tokens | {elapsed:.2f}s")
+            print(f"    tags: {result.get('tags')}")
+            print(f"    {result.get('summary')}")
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare snippet builder output against plain truncation.")
+    parser.add_argument("--feed", default="output.xml", help="Generated RSS feed to use as the fixture corpus")
+    parser.add_argument("--db", help="Use articles from this SQLite database instead of --feed")
+    parser.add_argument("--limit", type=int, default=500, help="Articles to read from --db")
+    parser.add_argument("--budget", type=int, default=snippet.SNIPPET_TOKEN_BUDGET)
+    parser.add_argument("--gemini", type=int, default=0, metavar="N",
+                        help="Also call Gemini with both inputs for the first N articles")
+    args = parser.parse_args()
+
+    corpus = load_db_corpus(args.db, args.limit) if args.db else load_feed_corpus(args.feed)
+    stats = evaluate(corpus, args.budget)
+
+    print(f"Articles evaluated: {len(stats['build_ms'])} (budget {args.budget} tokens)")
+    print(f"{'':24}{'baseline':>12}{'snippet':>12}")
+    print(f"{'input tokens (mean)':24}{mean(stats['baseline_tokens']):12.0f}{mean(stats['snippet_tokens']):12.0f}")
+    print(f"{'key-term coverage':24}{mean(stats['baseline_terms']):12.1%}{mean(stats['snippet_terms']):12.1%}")
+    print(f"{'summary-word coverage':24}{mean(stats['baseline_summary']):12.1%}{mean(stats['snippet_summary']):12.1%}")
+    print(f"Snippet build time: {mean(stats['build_ms']):.2f} ms/article")
+
+    if args.gemini:
+        compare_gemini(corpus, args.budget, args.gemini)
+
+if __name__ == "__main__":
+    main()
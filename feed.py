@@ -0,0 +1,444 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    # .br copies are only made when brotli is installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+FEED_TITLE = 'Curated Email Articles'
+FEED_DESCRIPTION = 'Aggregated articles from email newsletters, filtered and summarized.'
+
+RSS_HEADER = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<rss xmlns:atom="http://www.w3.org/2005/Atom" '
+    'xmlns:content="http://purl.org/rss/1.0/modules/content/" version="2.0"><channel>'
+)
+RSS_FOOTER = b"</channel></rss>"
+ATOM_HEADER = "<?xml version='1.0' encoding='UTF-8'?>\n<feed xmlns=\"http://www.w3.org/2005/Atom\">"
+ATOM_FOOTER = b"</feed>"
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+GENERATOR = "email-rss-expander"
+
+# Formats written for every published feed, in the order they are written
+FEED_FORMATS = ("rss", "atom", "json")
+# File extension replacing .xml for the non-RSS formats
+FORMAT_EXTENSIONS = {"atom": ".atom", "json": ".json"}
+
+# Quality 9 is ~10% larger than 11 but ~25x faster on a full feed
+BROTLI_QUALITY = 9
+
+# Characters XML 1.0 does not allow, even escaped (scraped pages do contain them)
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+# One output file: which rows (in order) go into it and its channel metadata. Without
+# full_content its items carry only the summary block, not the article's HTML.
+FeedSpec = namedtuple("FeedSpec", ["output", "title", "link", "description", "rows", "full_content"])
+FeedSpec.__new__.__defaults__ = (True,)
+
+# Format-independent view of one article, built once per row and shared by every format.
+# content_html is None for summary-only items.
+FeedItem = namedtuple("FeedItem", [
+    "id", "title", "link", "summary", "tags", "author", "image_url",
+    "description_html", "content_html", "published", "updated",
+])
+
+def _clean(value):
+    return INVALID_XML_CHARS.sub('', str(value)) if value is not None else ''
+
+def _text(value):
+    return escape(_clean(value))
+
+def _cdata(value):
+    # ']]>' would end the section early, so split it across two sections
+    return '<![CDATA[' + _clean(value).replace(']]>', ']]]]><![CDATA[>') + ']]>'
+
+def crawl_datetime(row):
+    """Parses crawl_date (SQLite CURRENT_TIMESTAMP, always UTC) into an aware datetime."""
+    try:
+        return datetime.fromisoformat(row['crawl_date']).replace(tzinfo=timezone.utc)
+    except Exception:
+        return None
+
+def published_datetime(row):
+    try:
+        # Try to parse ISO format if possible
+        pub_date = datetime.fromisoformat(row['published_date'])
+        # Ensure timezone
+        if pub_date.tzinfo is None:
+            pub_date = pub_date.astimezone()
+        return pub_date
+    except Exception:
+        # Fallback to crawl time (or current time) if parsing fails
+        return crawl_datetime(row) or datetime.now().astimezone()
+
+def build_item(row):
+    """Builds the shared item model for one stored article row."""
+    # Prepare metadata for description
+    source_domain = row['article_source_domain']
+    email_source = row['email_source']
+    author = row['author'] if 'author' in row.keys() and row['author'] else "Unknown"
+    reading_time = row['reading_time'] if 'reading_time' in row.keys() and row['reading_time'] else "?"
+
+    description_html = f"""
+        <p><strong>Summary:</strong> {row['summary']}</p>
+        <p><strong>Tags:</strong> {row['tags']}</p>
+        <p>
+            <strong>Source:</strong> {source_domain}<br/>
+            <strong>Author:</strong> {author}<br/>
+            <strong>Reading Time:</strong> ~{reading_time} min
+        </p>
+        <img src='{row['image_url']}' style='max-width:100%;'/>
+        <br/>
+        <p><small>Via: {email_source}</small></p>
+        """
+
+    # Content is the full view: Prepend summary and image to the main text
+    full_content_html = f"""
+        <div style="font-style: italic; padding: 10px; border-left: 4px solid #ccc; margin-bottom: 20px;">
+            <p><strong>Summary:</strong> {row['summary']}</p>
+            <p>
+                <strong>Source:</strong> {source_domain}<br/>
+                <strong>Author:</strong> {author}<br/>
+                <strong>Reading Time:</strong> ~{reading_time} min
+            </p>
+        </div>
+        <img src='{row['image_url']}' style='max-width:100%; margin-bottom: 20px;'/>
+        <hr/>
+        {row['content']}
+        """
+
+    published = published_datetime(row)
+    return FeedItem(
+        id=row['original_link'],
+        title=row['title'],
+        link=row['original_link'],
+        summary=row['summary'],
+        tags=[tag.strip() for tag in (row['tags'] or '').split(',') if tag.strip()],
+        author=author,
+        image_url=row['image_url'],
+        description_html=description_html,
+        content_html=full_content_html,
+        published=published,
+        updated=crawl_datetime(row) or published,
+    )
+
+def render_rss_item(item):
+    """Renders an item as an encoded RSS <item> fragment."""
+    content = f"<content:encoded>{_cdata(item.content_html)}</content:encoded>" if item.content_html is not None else ""
+    fragment = (
+        f"<item><title>{_text(item.title)}</title>"
+        f"<link>{_text(item.link)}</link>"
+        f"<description>{_text(item.description_html)}</description>{content}"
+        f'<guid isPermaLink="false">{_text(item.id)}</guid>'
+        f"<pubDate>{format_datetime(item.published)}</pubDate></item>"
+    )
+    return fragment.encode('utf-8')
+
+def render_atom_entry(item):
+    """Renders an item as an encoded Atom <entry> fragment."""
+    categories = "".join(f"<category term={quoteattr(_clean(tag))}/>" for tag in item.tags)
+    content = f'<content type="html">{_text(item.content_html)}</content>' if item.content_html is not None else ""
+    fragment = (
+        f"<entry><id>{_text(item.id)}</id><title>{_text(item.title)}</title>"
+        f"<link href={quoteattr(_clean(item.link))}/>"
+        f"<published>{item.published.isoformat()}</published>"
+        f"<updated>{item.updated.isoformat()}</updated>"
+        f"<author><name>{_text(item.author)}</name></author>{categories}"
+        f'<summary type="html">{_text(item.description_html)}</summary>{content}</entry>'
+    )
+    return fragment.encode('utf-8')
+
+def render_json_item(item):
+    """Renders an item as an encoded JSON Feed item object."""
+    entry = {
+        "id": item.id,
+        "url": item.link,
+        "title": _clean(item.title),
+        # JSON Feed requires content, so summary-only items use the summary block
+        "content_html": _clean(item.content_html if item.content_html is not None else item.description_html),
+        "summary": _clean(item.summary),
+        "date_published": item.published.isoformat(),
+        "date_modified": item.updated.isoformat(),
+        "authors": [{"name": item.author}],
+        "tags": item.tags,
+    }
+    if item.image_url:
+        entry["image"] = item.image_url
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def render_item(row):
+    """Renders one stored article row as an encoded RSS <item> fragment."""
+    return render_rss_item(build_item(row))
+
+def assemble_feed(fragments, link, title=FEED_TITLE, description=FEED_DESCRIPTION, last_build=None):
+    """Wraps pre-rendered <item> fragments in an RSS channel."""
+    header = (
+        f"{RSS_HEADER}<title>{_text(title)}</title><link>{_text(link)}</link>"
+        f"<description>{_text(description)}</description>"
+        "<docs>http://www.rssboard.org/rss-specification</docs>"
+        f"<generator>{GENERATOR}</generator>"
+    )
+    if last_build:
+        header += f"<lastBuildDate>{format_datetime(last_build)}</lastBuildDate>"
+    return header.encode('utf-8') + b"".join(fragments) + RSS_FOOTER
+
+def assemble_atom(fragments, link, feed_id, title=FEED_TITLE, description=FEED_DESCRIPTION, last_build=None):
+    """Wraps pre-rendered <entry> fragments in an Atom feed."""
+    # Atom requires <updated>; an empty feed gets a fixed date so its bytes stay stable
+    updated = last_build or datetime(1970, 1, 1, tzinfo=timezone.utc)
+    header = (
+        f"{ATOM_HEADER}<id>{_text(feed_id)}</id><title>{_text(title)}</title>"
+        f"<subtitle>{_text(description)}</subtitle><link href={quoteattr(_clean(link))}/>"
+        f"<updated>{updated.isoformat()}</updated><generator>{GENERATOR}</generator>"
+    )
+    return header.encode('utf-8') + b"".join(fragments) + ATOM_FOOTER
+
+def assemble_json(fragments, link, title=FEED_TITLE, description=FEED_DESCRIPTION):
+    """Wraps pre-rendered item objects in a JSON Feed."""
+    meta = {"version": JSON_FEED_VERSION, "title": title, "home_page_url": link, "description": description}
+    header = json.dumps(meta, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"items":['
+    return header.encode('utf-8') + b",".join(fragments) + b"]}"
+
+def last_build_date(rows):
+    # Derived from the data so identical rows render identical bytes
+    crawl_dates = [d for d in (crawl_datetime(row) for row in rows) if d]
+    return max(crawl_dates) if crawl_dates else None
+
+def render_feed(rows, link, title=FEED_TITLE, description=FEED_DESCRIPTION):
+    """Renders article rows (e.g. get_non_spam_articles or search_articles) into RSS bytes."""
+    return assemble_feed(
+        [render_item(row) for row in rows], link, title=title,
+        description=description, last_build=last_build_date(rows)
+    )
+
+def _holds(path, data):
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                return f.read() == data
+    except OSError:
+        pass
+    return False
+
+def write_if_changed(path, data):
+    """
+    Atomically replaces path with data unless it already holds exactly those bytes.
+    Returns True if the file was written.
+    """
+    if _holds(path, data):
+        return False
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+def precompress(path):
+    """
+    Writes .gz (and, with brotli installed, .br) copies of path for static
+    hosts that serve precompressed files. Copies newer than path are left
+    alone. Returns True if anything was compressed.
+    """
+    variants = [(path + '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((path + '.br', lambda data: brotli.compress(data, quality=BROTLI_QUALITY)))
+    mtime = os.path.getmtime(path)
+    stale = [(variant, compress) for variant, compress in variants
+             if not os.path.exists(variant) or os.path.getmtime(variant) < mtime]
+    if not stale:
+        return False
+    with open(path, 'rb') as f:
+        data = f.read()
+    for variant, compress in stale:
+        if not write_if_changed(variant, compress(data)):
+            # Same bytes: mark the copy current so it is not compressed again
+            os.utime(variant)
+    return True
+
+def is_feed_file(path):
+    return path.endswith((".xml",) + tuple(FORMAT_EXTENSIONS.values()))
+
+def precompress_feeds(paths):
+    """
+    Precompresses the feed files among paths, searching directories
+    recursively. Meant for the deploy step: the copies are not published
+    with the feeds themselves. Returns the number of files compressed.
+    """
+    compressed = 0
+    for root in paths:
+        if os.path.isdir(root):
+            files = [os.path.join(directory, name) for directory, _, names in os.walk(root) for name in names]
+        else:
+            files = [root]
+        for path in files:
+            if is_feed_file(path) and precompress(path):
+                compressed += 1
+    logger.info(f"Precompressed {compressed} feed files")
+    return compressed
+
+def format_path(output, fmt):
+    """Output file for a format: output.xml stays RSS, with output.atom and output.json beside it."""
+    if fmt == "rss":
+        return output
+    return os.path.splitext(output)[0] + FORMAT_EXTENSIONS[fmt]
+
+def write_feed(rows, output_file, link, title=FEED_TITLE, description=FEED_DESCRIPTION):
+    try:
+        if write_if_changed(output_file, render_feed(rows, link, title=title, description=description)):
+            logger.info(f"Successfully wrote RSS feed to {output_file}")
+        else:
+            logger.info(f"RSS feed {output_file} unchanged")
+    except Exception as e:
+        logger.error(f"Failed to write RSS file: {e}")
+
+def slugify(value):
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
+
+def _group_topics(rows, key_func):
+    """Groups rows by slug of one or more keys per row, keeping row order and the first spelling seen."""
+    groups = {}
+    for row in rows:
+        slugs = set()
+        for key in key_func(row):
+            slug = slugify(key) if key else ''
+            if not slug or slug in slugs:
+                continue
+            slugs.add(slug)
+            groups.setdefault(slug, (key, []))[1].append(row)
+    return groups
+
+# Subdirectories of the topic feed dir that plan_feeds writes into
+TOPIC_KINDS = ('tag', 'domain', 'newsletter')
+
+def plan_feeds(rows, rows_by_source, source_list, topic_config):
+    """
+    Decides every feed to publish: one per configured source from its own
+    newest rows (see db.get_source_feed_rows), plus per-tag, per-domain and
+    per-newsletter topic feeds from one list of recent candidate rows.
+    """
+    specs = []
+    for source in source_list:
+        source_rows = rows_by_source.get(source['name'], [])
+        specs.append(FeedSpec(
+            source['output'], source['title'], source['url'], FEED_DESCRIPTION, source_rows[:source['limit']]
+        ))
+
+    if not topic_config['enabled']:
+        return specs
+
+    topics = []
+    if topic_config['tags']:
+        topics.append(('tag', 'Tag', lambda row: (row['tags'] or '').split(',')))
+    if topic_config['domains']:
+        topics.append(('domain', 'Source', lambda row: [row['article_source_domain']]))
+    if topic_config['newsletters']:
+        topics.append(('newsletter', 'Newsletter', lambda row: [row['email_source']]))
+
+    for kind, label, key_func in topics:
+        for slug, (name, members) in sorted(_group_topics(rows, key_func).items()):
+            if len(members) < topic_config['min_items']:
+                continue
+            specs.append(FeedSpec(
+                os.path.join(topic_config['dir'], kind, f"{slug}.xml"),
+                f"{FEED_TITLE} - {label}: {name.strip()}",
+                topic_config['link'],
+                FEED_DESCRIPTION,
+                members[:topic_config['limit']],
+                topic_config['full_content'],
+            ))
+    return specs
+
+def prune_topic_feeds(topic_dir, specs, formats=FEED_FORMATS):
+    """
+    Deletes feed files that the current plan no longer publishes (e.g. a
+    topic that fell below min_items), including their compressed copies.
+    Only the generated topic_dir/{tag,domain,newsletter}/ subdirectories are
+    searched, so a topic_dir of "." never touches the source feeds or
+    anything else in it. Returns the number of files removed.
+    """
+    planned = {os.path.normpath(format_path(spec.output, fmt)) for spec in specs for fmt in formats}
+    removed = 0
+    walks = (os.walk(os.path.join(topic_dir, kind)) for kind in TOPIC_KINDS)
+    for directory, _, names in (entry for walk in walks for entry in walk):
+        for name in names:
+            path = os.path.join(directory, name)
+            base = path
+            for suffix in (".gz", ".br"):
+                if base.endswith(suffix):
+                    base = base[:-len(suffix)]
+            if not is_feed_file(base) or os.path.normpath(base) in planned:
+                continue
+            os.remove(path)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale feed files from {topic_dir}")
+    return removed
+
+def publish_feeds(specs, formats=FEED_FORMATS):
+    """
+    Builds every item used by any spec once, renders it once per format,
+    assembles each feed in each format from the shared fragments, and writes
+    only the files whose bytes changed. Compressed copies are left to the
+    deploy step (precompress_feeds).
+    """
+    renderers = {"rss": render_rss_item, "atom": render_atom_entry, "json": render_json_item}
+    items = {}
+    # Keyed by (row id, full_content): summary-only feeds render their own fragments
+    fragments = {fmt: {} for fmt in formats}
+    written = 0
+    for spec in specs:
+        last_build = last_build_date(spec.rows)
+        for fmt in formats:
+            spec_fragments = []
+            for row in spec.rows:
+                key = (row['id'], spec.full_content)
+                fragment = fragments[fmt].get(key)
+                if fragment is None:
+                    item = items.get(row['id'])
+                    if item is None:
+                        item = items[row['id']] = build_item(row)
+                    if not spec.full_content:
+                        item = item._replace(content_html=None)
+                    fragment = fragments[fmt][key] = renderers[fmt](item)
+                spec_fragments.append(fragment)
+
+            if fmt == "rss":
+                data = assemble_feed(spec_fragments, spec.link, title=spec.title,
+                                     description=spec.description, last_build=last_build)
+            elif fmt == "atom":
+                data = assemble_atom(spec_fragments, spec.link, f"urn:{GENERATOR}:{spec.output}",
+                                     title=spec.title, description=spec.description, last_build=last_build)
+            else:
+                data = assemble_json(spec_fragments, spec.link, title=spec.title, description=spec.description)
+
+            path = format_path(spec.output, fmt)
+            try:
+                if write_if_changed(path, data):
+                    written += 1
+            except Exception as e:
+                logger.error(f"Failed to write feed file {path}: {e}")
+
+    logger.info(
+        f"Published {len(specs)} feeds in {len(formats)} formats from {len(items)} items ({written} files changed)"
+    )
+    return written
@@ -0,0 +1,127 @@
+import logging
+import re
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Bodies declared larger than this are rejected; streamed bodies are cut off here and the prefix kept
+MAX_BODY_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Bytes of the body inspected to tell HTML from binary formats
+SNIFF_BYTES = 1024
+# Per-read socket timeout (connect, read) and overall wall-clock limit for one download
+REQUEST_TIMEOUT = (10, 15)
+DOWNLOAD_DEADLINE = 30
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# Content types that don't say what the body is; those are decided by sniffing
+GENERIC_CONTENT_TYPES = ('', 'text/plain', 'application/octet-stream', 'binary/octet-stream')
+
+# Leading bytes of formats that are never articles
+BINARY_SIGNATURES = [
+    (b'%PDF', 'pdf'),
+    (b'PK\x03\x04', 'zip'),
+    (b'\x89PNG', 'png'),
+    (b'GIF8', 'gif'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'RIFF', 'riff'),
+    (b'ID3', 'mp3'),
+    (b'OggS', 'ogg'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x1a\x45\xdf\xa3', 'webm'),
+    (b'\xd0\xcf\x11\xe0', 'ms-office'),
+]
+HTML_SNIFF = re.compile(rb'^\s*(<!doctype html|<html|<head|<body|<!--|<meta|<title|<div|<p[\s>])', re.IGNORECASE)
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+class FetchRejected(Exception):
+    """
+    The URL was fetched but is not worth parsing. permanent rejections (the
+    server declared a non-HTML type or an oversized body) are recorded in
+    failed_crawls; the rest are guesses from sniffing the body and are not.
+    """
+
+    def __init__(self, reason, permanent=True):
+        super().__init__(reason)
+        self.reason = reason
+        self.permanent = permanent
+
+def sniff_binary(head):
+    """Returns the name of a known binary format if the body starts like one."""
+    for signature, name in BINARY_SIGNATURES:
+        if head.startswith(signature):
+            return name
+    # ISO media (mp4, mov): 'ftyp' box at offset 4
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return None
+
+def looks_like_html(head):
+    return bool(HTML_SNIFF.match(head.lstrip(b'\xef\xbb\xbf')))
+
+def _decode(body, response):
+    # Only trust an explicit charset; requests falls back to ISO-8859-1 for text/*
+    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+    if not encoding:
+        match = META_CHARSET.search(body[:4096])
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def fetch_html(url, max_bytes=MAX_BODY_BYTES, timeout=REQUEST_TIMEOUT, deadline=DOWNLOAD_DEADLINE):
+    """
+    Streams url and returns its HTML (at most max_bytes of it), decoded.
+
+    Raises FetchRejected as soon as the headers or first bytes show the body
+    is not HTML or is declared larger than max_bytes. A download running
+    past deadline seconds raises requests.Timeout, and HTTP errors raise
+    requests.HTTPError, both worth retrying later.
+    """
+    started = time.monotonic()
+    with requests.get(url, stream=True, timeout=timeout, headers={'User-Agent': USER_AGENT}) as response:
+        response.raise_for_status()
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in HTML_CONTENT_TYPES and content_type not in GENERIC_CONTENT_TYPES:
+            raise FetchRejected(f"non-html content type: {content_type}")
+
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise FetchRejected(f"body too large: {content_length} bytes")
+
+        # read1 returns after a single socket read, so the deadline is checked
+        # at least once per read timeout however slowly the server trickles
+        chunks = []
+        size = 0
+        sniffed = False
+        while True:
+            chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+            chunks.append(chunk)
+            size += len(chunk)
+            if not sniffed and size and (size >= SNIFF_BYTES or not chunk):
+                sniffed = True
+                head = b''.join(chunks)[:SNIFF_BYTES]
+                binary_format = sniff_binary(head)
+                if binary_format:
+                    raise FetchRejected(f"binary body ({binary_format}) served as {content_type or 'unknown type'}",
+                                        permanent=False)
+                if content_type in GENERIC_CONTENT_TYPES and not looks_like_html(head):
+                    raise FetchRejected(f"body does not look like html ({content_type or 'no content type'})",
+                                        permanent=False)
+            if not chunk:
+                break
+            if size >= max_bytes:
+                logger.info(f"Truncated {url} at {max_bytes} bytes")
+                break
+            if time.monotonic() - started > deadline:
+                # A slow response says nothing about the page; let the caller retry it
+                raise requests.Timeout(f"download exceeded {deadline}s")
+
+        body = b''.join(chunks)[:max_bytes]
+        return _decode(body, response)
@@ -8,19 +8,24 @@ logger = logging.getLogger(__name__)
 
 EASYLIST_PATH = "easylist.txt"
 EASYLIST_URL = "https://easylist.to/easylist/easylist.txt"
+EASYLIST_TIMEOUT = 30
+
+# Default for LinkFilter(rules=...): load EasyList. None means "no rules" (e.g. the download failed)
+LOAD_RULES = object()
 
 class LinkFilter:
-    def __init__(self):
-        self.rules = self._load_rules()
+    def __init__(self, rules=LOAD_RULES, extra_blocked_domains=(), extra_blocked_substrings=()):
+        # Parsed EasyList rules can be shared between filters, parsing them is slow
+        self.rules = self._load_rules() if rules is LOAD_RULES else rules
         self.blocked_substrings = [
             "unsubscribe", "preferences", "view in browser", "privacy policy",
             "login", "signin", "signup", "register"
-        ]
+        ] + [s.lower() for s in extra_blocked_substrings]
         self.blocked_domains = [
             "twitter.com", "facebook.com", "linkedin.com", "instagram.com", "tiktok.com",
             "youtube.com", "google.com", "bing.com", "yahoo.com",
             "kill-the-newsletter.com"
-        ]
+        ] + [d.lower() for d in extra_blocked_domains]
         self.blocked_extensions = [
             ".png", ".jpg", ".jpeg", ".gif", ".svg", ".css", ".js", ".ico"
         ]
@@ -56,7 +61,7 @@ class LinkFilter:
         if not os.path.exists(EASYLIST_PATH):
             logger.info("Downloading EasyList...")
             try:
-                response = requests.get(EASYLIST_URL)
+                response = requests.get(EASYLIST_URL, timeout=EASYLIST_TIMEOUT)
                 response.raise_for_status()
                 with open(EASYLIST_PATH, 'wb') as f:
                     f.write(response.content)
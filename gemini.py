@@ -4,18 +4,28 @@ import os
 import logging
 import json
 
+import snippet
+
 logger = logging.getLogger(__name__)
 
+# Seconds before a Gemini request is abandoned (and the analyze job retried later)
+REQUEST_TIMEOUT = 60
+
 def get_client():
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         logger.error("GEMINI_API_KEY not found.")
         return None
-    return genai.Client(api_key=api_key)
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=REQUEST_TIMEOUT * 1000))
 
-def analyze_article(title, content_snippet):
+def analyze_article(title, content_snippet, raise_errors=False):
     """
     Analyzes the article content using Gemini to generate a summary and tags.
+    content_snippet should already be budgeted (see snippet.build_snippet).
+    The result includes 'prompt_tokens': the API's count when reported,
+    otherwise the local estimate.
+    A failed call returns a placeholder summary, or with raise_errors is
+    re-raised so the caller can retry it.
     """
     client = get_client()
     if not client:
@@ -28,7 +38,7 @@ def analyze_article(title, content_snippet):
     Analyze the following article content.
     
     Article Title: {title}
-    Content Snippet: {content_snippet[:4000]}... (truncated)
+    Content Excerpt (key passages, boilerplate removed): {content_snippet}
 
     Tasks:
     1. Write a concise summary of the article
@@ -51,7 +61,11 @@ def analyze_article(title, content_snippet):
             )
         )
         result = json.loads(response.text)
+        usage = getattr(response, "usage_metadata", None)
+        result["prompt_tokens"] = getattr(usage, "prompt_token_count", None) or snippet.estimate_tokens(prompt)
         return result
     except Exception as e:
         logger.error(f"Error calling Gemini: {e}")
+        if raise_errors:
+            raise
         return {"summary": "Error generating summary.", "tags": []}
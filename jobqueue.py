@@ -0,0 +1,329 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in order; when several jobs are claimable, later stages go first
+# so work in flight finishes before new work is started
+STAGES = ["discover", "fetch", "extract", "analyze", "store"]
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+# Retry delay doubles with each failed attempt
+RETRY_BASE_DELAY = 60
+
+# Seconds per job assumed for a stage until enough jobs have been timed
+DEFAULT_STAGE_COSTS = {"discover": 0.5, "fetch": 5.0, "extract": 1.0, "analyze": 5.0, "store": 0.2}
+# Recent finished jobs per stage sampled for its cost estimate, and the
+# percentile taken, so budgeting plans for slow jobs rather than typical ones
+COST_SAMPLE = 200
+COST_MIN_SAMPLES = 5
+COST_PERCENTILE = 0.95
+
+Job = namedtuple("Job", ["id", "stage", "key", "payload", "attempts", "max_attempts", "priority"])
+
+# A follow-up job to enqueue when a job completes
+NextJob = namedtuple("NextJob", ["stage", "key", "payload", "priority"])
+NextJob.__new__.__defaults__ = (0,)
+
+def connect():
+    # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(db.DB_PATH, timeout=db.BUSY_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _stage_order_sql():
+    cases = " ".join(f"WHEN '{stage}' THEN {rank}" for rank, stage in enumerate(STAGES))
+    return f"CASE stage {cases} ELSE 0 END"
+
+def _insert(conn, stage, key, payload, priority=0, max_attempts=MAX_ATTEMPTS):
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO jobs (stage, job_key, payload, priority, max_attempts) VALUES (?, ?, ?, ?, ?)",
+        (stage, key, json.dumps(payload), priority, max_attempts)
+    )
+    return cursor.rowcount == 1
+
+def enqueue(stage, key, payload, priority=0):
+    """
+    Adds a job unless one with the same (stage, key) already exists, in any
+    status. Returns True if a new job was created.
+    """
+    conn = connect()
+    try:
+        return _insert(conn, stage, key, payload, priority)
+    finally:
+        conn.close()
+
+def claim(worker_id, stages=STAGES, lease_seconds=LEASE_SECONDS):
+    """
+    Leases the next runnable job in the given stages, or returns None.
+    Runnable means pending and past its retry delay, or running under a
+    lease that expired (its worker died). Jobs that already used up their
+    attempts under expired leases are failed instead.
+    """
+    now = time.time()
+    placeholders = ",".join("?" for _ in stages)
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            f"""UPDATE jobs SET status = 'failed', finished_at = ?, last_error = 'lease expired'
+               WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts
+               AND stage IN ({placeholders})""",
+            (now, now, *stages)
+        )
+        row = conn.execute(
+            f"""SELECT * FROM jobs
+               WHERE stage IN ({placeholders})
+               AND ((status = 'pending' AND available_at <= ?)
+                    OR (status = 'running' AND lease_expires < ?))
+               ORDER BY {_stage_order_sql()} DESC, priority DESC, id
+               LIMIT 1""",
+            (*stages, now, now)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        if row['status'] == 'running':
+            logger.warning(f"Reclaiming job {row['id']} ({row['stage']}) from expired lease of {row['lease_owner']}")
+        conn.execute(
+            """UPDATE jobs SET status = 'running', attempts = attempts + 1,
+               lease_owner = ?, lease_expires = ?, heartbeat_at = ?, started_at = ?
+               WHERE id = ?""",
+            (worker_id, now + lease_seconds, now, now, row['id'])
+        )
+        conn.execute("COMMIT")
+        return Job(row['id'], row['stage'], row['job_key'], json.loads(row['payload'] or 'null'),
+                   row['attempts'] + 1, row['max_attempts'], row['priority'])
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def heartbeat(job, worker_id, lease_seconds=LEASE_SECONDS):
+    """Extends the lease on a running job. Returns False if the lease was lost to another worker."""
+    now = time.time()
+    conn = connect()
+    try:
+        cursor = conn.execute(
+            """UPDATE jobs SET lease_expires = ?, heartbeat_at = ?
+               WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (now + lease_seconds, now, job.id, worker_id)
+        )
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+def complete(job, worker_id, next_jobs=()):
+    """
+    Marks a job done and enqueues its follow-up jobs in the same transaction,
+    so a stage's output is never lost or handed on twice. The payload is
+    dropped since it can hold whole pages. Returns False (and enqueues
+    nothing) if this worker no longer holds the lease.
+    """
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute(
+            """UPDATE jobs SET status = 'done', finished_at = ?, payload = NULL, lease_owner = NULL
+               WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (time.time(), job.id, worker_id)
+        )
+        if cursor.rowcount != 1:
+            conn.execute("ROLLBACK")
+            logger.warning(f"Lost lease on job {job.id} ({job.stage}) before completing it")
+            return False
+        for next_job in next_jobs:
+            _insert(conn, next_job.stage, next_job.key, next_job.payload, next_job.priority)
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def fail(job, worker_id, error, retry=True):
+    """Releases a job after an error: back to pending with a delay, or failed for good."""
+    now = time.time()
+    give_up = not retry or job.attempts >= job.max_attempts
+    conn = connect()
+    try:
+        if give_up:
+            conn.execute(
+                """UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ?, lease_owner = NULL
+                   WHERE id = ? AND lease_owner = ?""",
+                (now, str(error), job.id, worker_id)
+            )
+        else:
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            conn.execute(
+                """UPDATE jobs SET status = 'pending', available_at = ?, last_error = ?, lease_owner = NULL
+                   WHERE id = ? AND lease_owner = ?""",
+                (now + delay, str(error), job.id, worker_id)
+            )
+    finally:
+        conn.close()
+
+def has_runnable_or_running(stages=STAGES, running_stages=None):
+    """
+    True while any job in stages could still be claimed now, or any job in
+    running_stages (default: stages) is being worked on and may hand on more.
+    """
+    now = time.time()
+    running_stages = stages if running_stages is None else running_stages
+    placeholders = ",".join("?" for _ in stages)
+    running_placeholders = ",".join("?" for _ in running_stages)
+    conn = connect()
+    try:
+        row = conn.execute(
+            f"""SELECT 1 FROM jobs
+               WHERE (status = 'pending' AND available_at <= ? AND stage IN ({placeholders}))
+               OR (status = 'running' AND stage IN ({running_placeholders}))
+               LIMIT 1""",
+            (now, *stages, *running_stages)
+        ).fetchone()
+        return row is not None
+    finally:
+        conn.close()
+
+def stats():
+    """Job counts as {stage: {status: count}}."""
+    conn = connect()
+    try:
+        rows = conn.execute("SELECT stage, status, count(*) AS n FROM jobs GROUP BY stage, status").fetchall()
+    finally:
+        conn.close()
+    result = {}
+    for row in rows:
+        result.setdefault(row['stage'], {})[row['status']] = row['n']
+    return result
+
+def count_pending(stages=STAGES):
+    placeholders = ",".join("?" for _ in stages)
+    conn = connect()
+    try:
+        return conn.execute(
+            f"SELECT count(*) FROM jobs WHERE status IN ('pending', 'running') AND stage IN ({placeholders})",
+            tuple(stages)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def stage_costs(sample=COST_SAMPLE, percentile=COST_PERCENTILE):
+    """
+    Seconds per job for each stage at the given percentile of the most recent
+    finished jobs. Stages with too few timed jobs fall back to DEFAULT_STAGE_COSTS.
+    """
+    conn = connect()
+    try:
+        rows = conn.execute(
+            """SELECT stage, finished_at - started_at AS seconds FROM (
+                   SELECT stage, started_at, finished_at,
+                          row_number() OVER (PARTITION BY stage ORDER BY finished_at DESC) AS recent
+                   FROM jobs WHERE status = 'done' AND started_at IS NOT NULL
+               ) WHERE recent <= ?""",
+            (sample,)
+        ).fetchall()
+    finally:
+        conn.close()
+    durations = {}
+    for row in rows:
+        durations.setdefault(row['stage'], []).append(row['seconds'])
+    costs = dict(DEFAULT_STAGE_COSTS)
+    for stage, seconds in durations.items():
+        if len(seconds) >= COST_MIN_SAMPLES:
+            seconds.sort()
+            costs[stage] = seconds[max(0, math.ceil(percentile * len(seconds)) - 1)]
+    return costs
+
+def record_run(started_at, budget, jobs_completed, jobs_deferred, publish_seconds):
+    conn = connect()
+    try:
+        conn.execute(
+            """INSERT INTO runs (started_at, budget, jobs_completed, jobs_deferred, publish_seconds)
+               VALUES (?, ?, ?, ?, ?)""",
+            (started_at, budget, jobs_completed, jobs_deferred, publish_seconds)
+        )
+    finally:
+        conn.close()
+
+def publish_seconds(sample=5):
+    """Longest feed publishing time of the last few runs, or None before the first run."""
+    conn = connect()
+    try:
+        row = conn.execute(
+            """SELECT max(publish_seconds) FROM (
+                   SELECT publish_seconds FROM runs WHERE publish_seconds IS NOT NULL
+                   ORDER BY id DESC LIMIT ?
+               )""",
+            (sample,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+def retry_failed(stages=STAGES):
+    """Puts failed jobs back in the queue with a fresh set of attempts."""
+    placeholders = ",".join("?" for _ in stages)
+    conn = connect()
+    try:
+        cursor = conn.execute(
+            f"""UPDATE jobs SET status = 'pending', attempts = 0, available_at = 0
+               WHERE status = 'failed' AND payload IS NOT NULL AND stage IN ({placeholders})""",
+            tuple(stages)
+        )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def purge_done(older_than_seconds=7 * 24 * 3600):
+    """Deletes finished jobs older than the cutoff; their (stage, key) can then be enqueued again."""
+    conn = connect()
+    try:
+        cursor = conn.execute(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+class Heartbeat:
+    """Keeps a job's lease alive from a background thread while its handler runs."""
+
+    def __init__(self, job, worker_id, lease_seconds=LEASE_SECONDS):
+        self.job = job
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not heartbeat(self.job, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lease on job {self.job.id} was taken over by another worker")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {self.job.id} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
@@ -1,21 +1,22 @@
+import argparse
 import logging
 import os
 import sys
+import time
 import requests
-import hashlib
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
-from newspaper import Article
-from feedgen.feed import FeedGenerator
 from datetime import datetime
-from urllib.parse import urlparse
-import lxml.html
 from dotenv import load_dotenv
 
 # Import helper modules
 import db
-import filters
-import gemini
+import feed
+import jobqueue
+import scheduler
+import sources
+import worker
 
 # Load environment variables
 load_dotenv()
@@ -30,296 +31,150 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-FEED_URL = "https://kill-the-newsletter.com/feeds/km69ge1d7gq6c4rhg5uv.xml"
-OUTPUT_FILE = "output.xml"
+# Feeds are fetched and parsed in parallel; queue workers (which also call Gemini) less so
+FETCH_WORKERS = 16
+CRAWL_WORKERS = 4
+FEED_TIMEOUT = 30
 
 # Function to fix kill-the-newsletter date format if needed, or use current time if parsing fails
 # But for now we will try to pass the raw date string or simple parsing
 def parse_date(date_str):
     return date_str
 
-def hash_content(content):
-    if not content:
-        return ""
-    return hashlib.sha256(content.encode('utf-8')).hexdigest()
-
-def clean_html_content(node):
-    """
-    Extracts HTML from a lxml node and cleans it for RSS.
-    Removes attributes like class, id, style to keep it clean.
-    """
-    if node is None:
-        return ""
-    
-    # Create a copy to avoid modifying the original tree if needed, 
-    # though here we are just taking the node from newspaper's parse tree.
-    
-    # Iterate over all elements and strip attributes
-    for element in node.iter():
-        # Keep href and src, strip others
-        keys = list(element.attrib.keys())
-        for key in keys:
-            if key not in ['href', 'src', 'alt', 'title']:
-                del element.attrib[key]
-                
-    # Serialize to string
-    return lxml.html.tostring(node, encoding='unicode', method='html')
-
-def process_feed(feed_path):
-    logger.info("Starting Email RSS Expander")
-    
-    # Check for API Key
-    if not os.environ.get("GEMINI_API_KEY"):
-        logger.warning("GEMINI_API_KEY environment variable not found. Gemini features will fail.")
-
-    # 1. Initialize DB and Filters
-    db.init_db()
-    link_filter = filters.LinkFilter()
-    
-    # 2. Fetch Feed
-    logger.info(f"Fetching feed from {FEED_URL}...")
-    xml_content = None
+def fetch_feed(source):
+    """Downloads a source's feed XML, falling back to its local copy if configured."""
+    logger.info(f"[{source['name']}] Fetching feed from {source['url']}...")
     try:
-        response = requests.get(FEED_URL)
+        response = requests.get(source['url'], timeout=FEED_TIMEOUT)
         response.raise_for_status()
-        xml_content = response.content
+        return response.content
     except Exception as e:
-        logger.error(f"Failed to fetch feed: {e}")
+        logger.error(f"[{source['name']}] Failed to fetch feed: {e}")
         # Fallback to local file for testing/dev or if feed is down
-        local_path = "sample-input/km69ge1d7gq6c4rhg5uv.xml"
-        if os.path.exists(local_path):
-            logger.info(f"Falling back to local file: {local_path}")
+        local_path = source.get('fallback')
+        if local_path and os.path.exists(local_path):
+            logger.info(f"[{source['name']}] Falling back to local file: {local_path}")
             with open(local_path, 'rb') as f:
-                xml_content = f.read()
-        else:
-            logger.error("No local backup available. Exiting.")
-            return
-
-    # 3. Parse XML
-    try:
-        if not xml_content:
-            return
-        root = ET.fromstring(xml_content)
-        # Handle namespaces if present, usually atom has namespace {http://www.w3.org/2005/Atom}
-        # We can strip namespaces or just use wildcard find
-        # For simplicity in ElementTree with namespaces, it's often easier to strip them or use a helper
-        # Let's try to just find 'entry' tags. If default namespace is used, we need to handle it.
-        # Quick hack: parsing with BeautifulSoup might be easier for namespace-heavy XML
-        soup = BeautifulSoup(xml_content, 'xml')
-        entries = soup.find_all('entry')
-    except Exception as e:
-        logger.error(f"Failed to parse XML: {e}")
-        return
-    
-    logger.info(f"Found {len(entries)} entries in the feed.")
-
-    # 4. Process Entries
-    for entry in entries:
+                return f.read()
+        logger.error(f"[{source['name']}] No local backup available.")
+        return None
+
+def parse_entries(xml_content):
+    """Parses feed XML into entry dicts with id, title, html content and date."""
+    # Validate the XML strictly first, then use BeautifulSoup which copes better with namespaces
+    ET.fromstring(xml_content)
+    soup = BeautifulSoup(xml_content, 'xml')
+
+    entries = []
+    for entry in soup.find_all('entry'):
         entry_id = entry.find('id').text if entry.find('id') else None
         if not entry_id:
             logger.warning("Entry found without ID, skipping.")
             continue
-            
-        if db.entry_exists(entry_id):
-            logger.info(f"Entry {entry_id} already processed. Skipping.")
-            continue
-            
-        logger.info(f"Processing new entry: {entry_id}")
-        
-        email_title = entry.find('title').text if entry.find('title') else "No Title"
+
         content_tag = entry.find('content')
         if not content_tag:
-            logger.warning("No content tag found in entry.")
+            logger.warning(f"No content tag found in entry {entry_id}.")
             continue
-            
-        html_content = content_tag.text # BeautifulSoup automatically decodes entities
-        
+
         # Extract feed entry date (prefer updated, fallback to published)
         entry_date = entry.find('updated').text if entry.find('updated') else None
         if not entry_date:
             entry_date = entry.find('published').text if entry.find('published') else datetime.now().isoformat()
 
-        # Link Extraction
-        link_soup = BeautifulSoup(html_content, 'html.parser')
-        links = link_soup.find_all('a', href=True)
-        
-        unique_urls = set()
-        for link in links:
-            raw_url = link['href']
-            # Unwrap potential redirects
-            unwrapped_url = link_filter.unwrap_redirect(raw_url)
-            
-            link_text = link.get_text(strip=True)
-            if link_filter.is_valid_url(unwrapped_url, link_text=link_text):
-                normalized_url = link_filter.normalize_url(unwrapped_url)
-                unique_urls.add(normalized_url)
-        
-        logger.info(f"Found {len(unique_urls)} potential article links in email '{email_title}'")
-        
-        # Crawl Articles
-        for url in unique_urls:
-            # Check if URL exists in DB or has failed previously
-            if db.article_exists(url=url):
-                logger.info(f"Skipping duplicate URL: {url}")
-                continue
-            
-            if db.is_crawl_failed(url):
-                logger.info(f"Skipping previously failed URL: {url}")
-                continue
-            
-            logger.info(f"Crawling article: {url}")
-            try:
-                article = Article(url)
-                article.download()
-                article.parse()
-                
-                # Extract Data
-                title = article.title
-                text = article.text
-                
-                # Extract HTML Content with formatting
-                html_content = ""
-                if article.top_node is not None:
-                    try:
-                        html_content = clean_html_content(article.top_node)
-                    except Exception as e:
-                        logger.warning(f"Failed to extract HTML content: {e}")
-                        html_content = text # Fallback
-                else:
-                    html_content = text
-                
-                # Prefer HTML content for DB
-                db_content = html_content if html_content else text
-
-                if not text or len(text.strip()) < 100:
-                    logger.warning(f"Skipping article with insufficient content: {url}")
-                    continue
+        entries.append({
+            'entry_id': entry_id,
+            'title': entry.find('title').text if entry.find('title') else "No Title",
+            'html': content_tag.text,  # BeautifulSoup automatically decodes entities
+            'date': entry_date,
+        })
+    return entries
 
-                # Content Hashing for Deduplication
-                content_hash = hash_content(text)
-                
-                if db.article_exists(content_hash=content_hash):
-                    logger.info(f"Skipping duplicate content (hash match): {url}")
-                    continue
+def collect_source(source):
+    """
+    Fetches and parses one source and returns its unprocessed entries.
+    Runs in a worker thread.
+    """
+    xml_content = fetch_feed(source)
+    if not xml_content:
+        return []
 
-                publish_date = str(article.publish_date) if article.publish_date else datetime.now().isoformat()
-                image = article.top_image
-                source_domain = urlparse(url).netloc
-                
-                # Extract Author(s)
-                authors = ", ".join(article.authors) if article.authors else "Unknown Author"
+    try:
+        entries = parse_entries(xml_content)
+    except Exception as e:
+        logger.error(f"[{source['name']}] Failed to parse XML: {e}")
+        return []
+    logger.info(f"[{source['name']}] Found {len(entries)} entries in the feed.")
+
+    return [entry for entry in entries if not db.entry_exists(entry['entry_id'])]
+
+def seed_jobs(source_name, entry):
+    """Queues an email for link discovery; the rest of the pipeline follows from that job."""
+    payload = dict(entry, source=source_name)
+    # Newest emails first, so a backlog never starves today's newsletters
+    if jobqueue.enqueue('discover', f"{source_name} {entry['entry_id']}", payload, scheduler.entry_priority(entry)):
+        logger.info(f"[{source_name}] Queued email '{entry['title']}'")
+    # The job now owns the email, so it is not picked up again even if this run dies
+    db.mark_entry_processed(entry['entry_id'])
+
+def process_sources(source_list, budget_seconds=None):
+    """
+    Runs the whole pipeline once. With budget_seconds, new crawls and Gemini
+    calls stop early enough to always leave time for writing the feeds;
+    whatever is left stays queued for the next run.
+    """
+    started_at = time.time()
+    logger.info("Starting Email RSS Expander")
+    
+    # Check for API Key
+    if not os.environ.get("GEMINI_API_KEY"):
+        logger.warning("GEMINI_API_KEY environment variable not found. Gemini features will fail.")
 
-                # Calculate Reading Time
-                # Standard reading speed is ~200-250 wpm
-                text_len = len(text.split())
-                reading_time = max(1, round(text_len / 200))
+    # 1. Initialize DB (including the job queue), rebuilding it from the committed snapshot if missing
+    if not os.path.exists(db.DB_PATH):
+        db.import_snapshot()
+    db.init_db()
+    budget = scheduler.RunBudget(budget_seconds, started_at) if budget_seconds else None
 
-                # Gemini Analysis
-                analysis = gemini.analyze_article(title, text[:4000])
-                summary = analysis.get("summary", "")
-                tags = analysis.get("tags", [])
-                
-                article_data = {
-                    'feed_entry_id': entry_id,
-                    'email_source': email_title,
-                    'article_source_domain': source_domain,
-                    'title': title,
-                    'content': db_content,
-                    'summary': summary,
-                    'tags': ",".join(tags),
-                    'image_url': image,
-                    'original_link': url,
-                    'content_hash': content_hash,
-                    'published_date': publish_date,
-                    'feed_source_date': entry_date,
-                    'author': authors,
-                    'reading_time': reading_time
-                }
-                
-                db.save_article(article_data)
-                
+    # 2. Fetch and parse every source concurrently, queueing new emails as they come in
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = {pool.submit(collect_source, source): source for source in source_list}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                entries = future.result()
             except Exception as e:
-                logger.error(f"Failed to process article {url}: {e}")
-                error_msg = str(e)
-                if "403" in error_msg or "401" in error_msg:
-                    logger.warning(f"Marking URL as failed (403/401): {url}")
-                    db.mark_crawl_failed(url, "403/401 Forbidden/Unauthorized")
-        
-        # Mark entry as processed
-        db.mark_entry_processed(entry_id)
-
-    # 5. Generate Output Output
-    logger.info("Generating RSS feed...")
-    fg = FeedGenerator()
-    fg.title('Curated Email Articles')
-    fg.link(href=FEED_URL, rel='alternate')
-    fg.description('Aggregated articles from email newsletters, filtered and summarized.')
-    
-    articles = db.get_non_spam_articles(limit=50)
-    for row in articles:
-        fe = fg.add_entry()
-        fe.title(row['title'])
-        fe.link(href=row['original_link'])
-        
-        # Prepare metadata for description
-        source_domain = row['article_source_domain']
-        email_source = row['email_source']
-        author = row['author'] if 'author' in row.keys() and row['author'] else "Unknown"
-        reading_time = row['reading_time'] if 'reading_time' in row.keys() and row['reading_time'] else "?"
-        
-        description_html = f"""
-        <p><strong>Summary:</strong> {row['summary']}</p>
-        <p><strong>Tags:</strong> {row['tags']}</p>
-        <p>
-            <strong>Source:</strong> {source_domain}<br/>
-            <strong>Author:</strong> {author}<br/>
-            <strong>Reading Time:</strong> ~{reading_time} min
-        </p>
-        <img src='{row['image_url']}' style='max-width:100%;'/>
-        <br/>
-        <p><small>Via: {email_source}</small></p>
-        """
-        
-        fe.description(description_html)
-        
-        # Content is the full view: Prepend summary and image to the main text
-        full_content_html = f"""
-        <div style="font-style: italic; padding: 10px; border-left: 4px solid #ccc; margin-bottom: 20px;">
-            <p><strong>Summary:</strong> {row['summary']}</p>
-            <p>
-                <strong>Source:</strong> {source_domain}<br/>
-                <strong>Author:</strong> {author}<br/>
-                <strong>Reading Time:</strong> ~{reading_time} min
-            </p>
-        </div>
-        <img src='{row['image_url']}' style='max-width:100%; margin-bottom: 20px;'/>
-        <hr/>
-        {row['content']}
-        """
-        fe.content(content=full_content_html, type='CDATA')
-        
-        # Handle date parsing
-        try:
-            # Try to parse ISO format if possible
-            pub_date = datetime.fromisoformat(row['published_date'])
-            # Ensure timezone
-            if pub_date.tzinfo is None:
-                pub_date = pub_date.astimezone()
-            fe.pubDate(pub_date)
-        except Exception:
-            # Fallback to current time if parsing fails
-            fe.pubDate(datetime.now().astimezone())
-            
-        fe.guid(row['original_link'])
-    
-    try:
-        fg.rss_file(OUTPUT_FILE)
-        logger.info(f"Successfully wrote RSS feed to {OUTPUT_FILE}")
-    except Exception as e:
-        logger.error(f"Failed to write RSS file: {e}")
+                logger.error(f"[{source['name']}] Failed to collect entries: {e}")
+                continue
+            for entry in entries:
+                seed_jobs(source['name'], entry)
+
+    # 3. Drain the queue: discover -> fetch -> extract -> analyze -> store.
+    # Jobs left over from an interrupted run are picked up here too.
+    logger.info(f"Running {CRAWL_WORKERS} pipeline workers: {jobqueue.stats()}")
+    completed = worker.run_threads(CRAWL_WORKERS, budget=budget)
+    deferred = jobqueue.count_pending()
+    if deferred:
+        logger.info(f"{deferred} jobs deferred to the next run")
+
+    # 4. Publish every source and topic feed from one read of the candidate rows
+    logger.info("Generating RSS feeds...")
+    publish_started = time.time()
+    topic_config = sources.load_topic_feeds()
+    rows = db.get_feed_candidates(limit=topic_config['candidates']) if topic_config['enabled'] else []
+    rows_by_source = db.get_source_feed_rows(limit=max(source['limit'] for source in source_list))
+    specs = feed.plan_feeds(rows, rows_by_source, source_list, topic_config)
+    feed.publish_feeds(specs)
+    feed.prune_topic_feeds(topic_config['dir'], specs)
+    jobqueue.record_run(started_at, budget_seconds, completed, deferred, time.time() - publish_started)
 
 def main():
-    process_feed(FEED_URL)
+    parser = argparse.ArgumentParser(description="Expand newsletter emails into full-article RSS feeds.")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        default=float(os.environ["RUN_BUDGET"]) if os.environ.get("RUN_BUDGET") else None,
+                        help="Wall-clock limit for the run, publishing included (default: $RUN_BUDGET or none)")
+    args = parser.parse_args()
+    process_sources(sources.load_sources(), budget_seconds=args.budget)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+import lxml.html
+from bs4 import BeautifulSoup
+from newspaper import Article
+
+import db
+import fetcher
+import filters
+import gemini
+import snippet
+import scheduler
+import sources
+import spam_model
+from jobqueue import NextJob
+
+logger = logging.getLogger(__name__)
+
+# Per-source link filters, built once per process (EasyList rules are parsed once and shared)
+_link_filters = {}
+_link_filters_lock = threading.Lock()
+
+def hash_content(content):
+    if not content:
+        return ""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def clean_html_content(node):
+    """
+    Extracts HTML from a lxml node and cleans it for RSS.
+    Removes attributes like class, id, style to keep it clean.
+    """
+    if node is None:
+        return ""
+
+    # Iterate over all elements and strip attributes
+    for element in node.iter():
+        # Keep href and src, strip others
+        keys = list(element.attrib.keys())
+        for key in keys:
+            if key not in ['href', 'src', 'alt', 'title']:
+                del element.attrib[key]
+
+    # Serialize to string
+    return lxml.html.tostring(node, encoding='unicode', method='html')
+
+def extract_links(html_content, link_filter):
+    """Returns the normalized, filtered article URLs linked from an email."""
+    link_soup = BeautifulSoup(html_content, 'html.parser')
+    unique_urls = set()
+    for link in link_soup.find_all('a', href=True):
+        raw_url = link['href']
+        # Unwrap potential redirects
+        unwrapped_url = link_filter.unwrap_redirect(raw_url)
+
+        link_text = link.get_text(strip=True)
+        if link_filter.is_valid_url(unwrapped_url, link_text=link_text):
+            normalized_url = link_filter.normalize_url(unwrapped_url)
+            unique_urls.add(normalized_url)
+    return unique_urls
+
+def get_link_filter(source_name):
+    with _link_filters_lock:
+        if not _link_filters:
+            base_filter = filters.LinkFilter()
+            _link_filters[None] = base_filter
+            for source in sources.load_sources():
+                _link_filters[source['name']] = filters.LinkFilter(
+                    rules=base_filter.rules,
+                    extra_blocked_domains=source['filters']['blocked_domains'],
+                    extra_blocked_substrings=source['filters']['blocked_substrings'],
+                )
+        # A source removed from the config since its entry was queued gets the shared rules only
+        return _link_filters.get(source_name, _link_filters[None])
+
+# Stage handlers. Each takes a claimed job and returns the follow-up jobs to
+# enqueue; returning [] ends the chain for that item. Exceptions are retried
+# by the worker, so handlers only catch errors that retrying would not fix.
+
+def discover(job):
+    """Extracts article links from one email and queues the ones not seen before."""
+    entry = job.payload
+    source_name = entry['source']
+    urls = extract_links(entry['html'], get_link_filter(source_name))
+    logger.info(f"[{source_name}] Found {len(urls)} potential article links in email '{entry['title']}'")
+
+    # The first email that linked an article provides its feed context
+    context = {
+        'feed_entry_id': entry['entry_id'],
+        'email_source': entry['title'],
+        'feed_source_date': entry['date'],
+    }
+    next_jobs = []
+    for url in sorted(urls):
+        # Link up front: the article may already exist, or be crawled for another inbox
+        db.link_article_source(url, source_name, entry['entry_id'])
+        if db.article_exists(url=url):
+            logger.info(f"Skipping duplicate URL: {url}")
+            continue
+        if db.is_crawl_failed(url):
+            logger.info(f"Skipping previously failed URL: {url}")
+            continue
+        # Keyed by URL, so a link shared by several emails is fetched once.
+        # Links to domains that usually work go ahead of the rest of their email.
+        next_jobs.append(NextJob('fetch', url, {'url': url, 'context': context},
+                                 scheduler.url_priority(job.priority, url)))
+    return next_jobs
+
+def fetch(job):
+    url = job.payload['url']
+    logger.info(f"Crawling article: {url}")
+    try:
+        # Stream the page ourselves so non-HTML and oversized bodies are rejected early
+        html = fetcher.fetch_html(url)
+    except fetcher.FetchRejected as e:
+        logger.warning(f"Rejected {url}: {e.reason}")
+        if e.permanent:
+            db.mark_crawl_failed(url, e.reason)
+        return []
+    except Exception as e:
+        error_msg = str(e)
+        if "403" in error_msg or "401" in error_msg:
+            logger.warning(f"Marking URL as failed (403/401): {url}")
+            db.mark_crawl_failed(url, "403/401 Forbidden/Unauthorized")
+            return []
+        raise
+    return [NextJob('extract', url, dict(job.payload, html=html), job.priority)]
+
+def extract(job):
+    """Parses the fetched HTML with newspaper into the article fields."""
+    url = job.payload['url']
+    article = Article(url)
+    article.download(input_html=job.payload['html'])
+    article.parse()
+
+    title = article.title
+    text = article.text
+
+    # Extract HTML Content with formatting
+    html_content = ""
+    if article.top_node is not None:
+        try:
+            html_content = clean_html_content(article.top_node)
+        except Exception as e:
+            logger.warning(f"Failed to extract HTML content: {e}")
+            html_content = text # Fallback
+    else:
+        html_content = text
+
+    if not text or len(text.strip()) < 100:
+        logger.warning(f"Skipping article with insufficient content: {url}")
+        return []
+
+    # Content Hashing for Deduplication
+    content_hash = hash_content(text)
+    existing_link = db.find_article_link(content_hash)
+    if existing_link:
+        logger.info(f"Linking duplicate content (hash match) {url} to {existing_link}")
+        db.copy_article_sources(url, existing_link)
+        return []
+
+    # Calculate Reading Time
+    # Standard reading speed is ~200-250 wpm
+    text_len = len(text.split())
+
+    fields = {
+        'article_source_domain': urlparse(url).netloc,
+        'title': title,
+        # Prefer HTML content for DB
+        'content': html_content if html_content else text,
+        'image_url': article.top_image,
+        'original_link': url,
+        'content_hash': content_hash,
+        'published_date': str(article.publish_date) if article.publish_date else datetime.now().isoformat(),
+        'author': ", ".join(article.authors) if article.authors else "Unknown Author",
+        'reading_time': max(1, round(text_len / 200)),
+    }
+    return [NextJob('analyze', url, {'url': url, 'context': job.payload['context'],
+                                     'article': fields, 'text': text}, job.priority)]
+
+def analyze(job):
+    """Summarizes and tags the article, skipping Gemini for confident spam."""
+    url = job.payload['url']
+    fields = job.payload['article']
+    text = job.payload['text']
+
+    # Local spam pre-filter: skip the Gemini call for high-confidence spam. It scores
+    # the stored content, as it was trained, not newspaper's text
+    spam_score = spam_model.spam_score(fields['title'], fields['content'], fields['article_source_domain'])
+    if spam_model.is_confident_spam(spam_score):
+        logger.info(f"Skipping Gemini for likely spam (log-odds {spam_score:.1f}): {url}")
+        analysis = {"summary": "", "tags": ["spam", spam_model.PREFILTER_TAG], "prompt_tokens": 0}
+    else:
+        # Errors propagate so the queue retries the call instead of storing a placeholder summary
+        analysis = gemini.analyze_article(fields['title'], snippet.build_snippet(fields['title'], text),
+                                          raise_errors=True)
+
+    fields = dict(fields,
+                  summary=analysis.get("summary", ""),
+                  tags=",".join(analysis.get("tags", [])),
+                  prompt_tokens=analysis.get("prompt_tokens"))
+    return [NextJob('store', url, {'url': url, 'context': job.payload['context'], 'article': fields}, job.priority)]
+
+def store(job):
+    url = job.payload['url']
+    article_data = dict(job.payload['article'], **job.payload['context'])
+
+    # Same content may have been stored under another URL since this one was extracted
+    existing_link = db.find_article_link(article_data['content_hash'])
+    if existing_link:
+        logger.info(f"Linking duplicate content (hash match) {url} to {existing_link}")
+        db.copy_article_sources(url, existing_link)
+        return []
+    db.save_article(article_data)
+    return []
+
+HANDLERS = {
+    'discover': discover,
+    'fetch': fetch,
+    'extract': extract,
+    'analyze': analyze,
+    'store': store,
+}
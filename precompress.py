@@ -0,0 +1,60 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+
+import feed
+import sources
+
+logger = logging.getLogger(__name__)
+
+def default_paths():
+    """Every source's feed files plus the topic feed directory."""
+    paths = [feed.format_path(source['output'], fmt) for source in sources.load_sources() for fmt in feed.FEED_FORMATS]
+    return paths + [sources.load_topic_feeds()['dir']]
+
+def feed_files(paths):
+    for root in paths:
+        if os.path.isdir(root):
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    if feed.is_feed_file(name):
+                        yield os.path.join(directory, name)
+        elif os.path.exists(root) and feed.is_feed_file(root):
+            yield root
+
+def copy_to_site(paths, site_dir):
+    """Copies the feed files among paths into site_dir at the same relative paths. Returns the copies."""
+    copies = []
+    for path in feed_files(paths):
+        relative = os.path.relpath(path)
+        if relative.startswith(os.pardir):
+            raise ValueError(f"{path} is outside the working directory")
+        target = os.path.join(site_dir, relative)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        # copy2 keeps the mtime, so copies already compressed in site_dir stay current
+        shutil.copy2(path, target)
+        copies.append(target)
+    logger.info(f"Copied {len(copies)} feed files to {site_dir}")
+    return copies
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Write .gz/.br copies of the published feeds for a static host. Run it in the deploy "
+                    "step; the copies are not committed."
+    )
+    parser.add_argument("paths", nargs="*", help="Feed files or directories (default: all published feeds)")
+    parser.add_argument("--site", metavar="DIR",
+                        help="Copy the feeds into DIR (e.g. a Pages artifact) and compress the copies there")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or default_paths()
+    if args.site:
+        paths = copy_to_site(paths, args.site)
+    feed.precompress_feeds(list(feed_files(paths)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,26 +8,45 @@ logger = logging.getLogger(__name__)
 DB_PATH = "articles.db"
 ENTRY_ID = "urn:kill-the-newsletter:usj34hqxf8ounvnzj4qd"
 
-def reset_entry():
-    conn = sqlite3.connect(DB_PATH)
+def reset_entry(entry_id=ENTRY_ID, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     try:
         # Enable foreign key support to be safe, though we will delete manually
         cursor.execute("PRAGMA foreign_keys = ON")
         
-        # 1. Delete associated articles first
-        cursor.execute("DELETE FROM articles WHERE feed_entry_id = ?", (ENTRY_ID,))
+        # 1. Delete associated articles first, remembering their links
+        links = [row[0] for row in cursor.execute(
+            "SELECT original_link FROM articles WHERE feed_entry_id = ?", (entry_id,)
+        )]
+        cursor.execute("DELETE FROM articles WHERE feed_entry_id = ?", (entry_id,))
         articles_deleted = cursor.rowcount
-        logger.info(f"Deleted {articles_deleted} articles associated with {ENTRY_ID}")
+        logger.info(f"Deleted {articles_deleted} articles associated with {entry_id}")
         
-        # 2. Delete the entry record
-        cursor.execute("DELETE FROM entries WHERE entry_id = ?", (ENTRY_ID,))
+        # 2. Delete its queued and finished jobs, so seeding the entry again
+        # runs discovery and crawls its links instead of matching the old jobs.
+        # Finished jobs have no payload left: the discover job is keyed
+        # "<source> <entry_id>" and the later stages by article URL.
+        suffix = " " + entry_id
+        cursor.execute("""
+            DELETE FROM jobs
+            WHERE (stage = 'discover' AND substr(job_key, -?) = ?)
+               OR json_extract(payload, '$.context.feed_entry_id') = ?
+        """, (len(suffix), suffix, entry_id))
+        jobs_deleted = cursor.rowcount
+        for link in links:
+            cursor.execute("DELETE FROM jobs WHERE stage != 'discover' AND job_key = ?", (link,))
+            jobs_deleted += cursor.rowcount
+        logger.info(f"Deleted {jobs_deleted} pipeline jobs associated with {entry_id}")
+
+        # 3. Delete the entry record
+        cursor.execute("DELETE FROM entries WHERE entry_id = ?", (entry_id,))
         entries_deleted = cursor.rowcount
         if entries_deleted > 0:
-            logger.info(f"Successfully deleted entry record: {ENTRY_ID}")
+            logger.info(f"Successfully deleted entry record: {entry_id}")
         else:
-            logger.warning(f"Entry not found in entries table: {ENTRY_ID}")
+            logger.warning(f"Entry not found in entries table: {entry_id}")
             
         conn.commit()
         
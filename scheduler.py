@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import db
+import fetcher
+import gemini
+import jobqueue
+
+logger = logging.getLogger(__name__)
+
+# Time always kept back for writing the feeds, and the margin applied to past publishing times
+MIN_PUBLISH_RESERVE = 30
+PUBLISH_SAFETY_FACTOR = 2.0
+# A domain whose links always work ranks like an email this many seconds newer
+DOMAIN_WEIGHT = 6 * 3600
+# Longest a job in these stages can run: the download deadline is checked
+# between reads, so one more read timeout can pass before it trips
+STAGE_TIME_LIMITS = {
+    'fetch': fetcher.DOWNLOAD_DEADLINE + fetcher.REQUEST_TIMEOUT[1],
+    'analyze': gemini.REQUEST_TIMEOUT,
+}
+
+_domain_rates = None
+_domain_rates_lock = threading.Lock()
+
+def entry_priority(entry):
+    """Newest emails first: the priority is the entry's timestamp."""
+    try:
+        return datetime.fromisoformat(entry['date']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+def domain_success_rate(url):
+    """Smoothed share of past crawls from this URL's domain that produced an article."""
+    global _domain_rates
+    with _domain_rates_lock:
+        if _domain_rates is None:
+            _domain_rates = {
+                domain: (stored + 1) / (stored + failed + 2)
+                for domain, (stored, failed) in db.get_domain_outcomes().items()
+            }
+    return _domain_rates.get(urlparse(url).netloc, 0.5)
+
+def url_priority(entry_priority, url):
+    return entry_priority + DOMAIN_WEIGHT * domain_success_rate(url)
+
+class RunBudget:
+    """
+    Wall-clock budget for one run. Workers ask it which stages still fit
+    before claiming a job, so new crawls and Gemini calls stop in time to
+    leave the publishing reserve. A stage's cost is the slower of its 95th
+    percentile on past runs and its enforced time limit, if it has one, so
+    a crawl or Gemini call claimed just before the cutoff cannot run into
+    the reserve. Jobs not started stay queued for the next run.
+    """
+
+    def __init__(self, seconds, started_at=None):
+        self.seconds = seconds
+        self.started_at = started_at or time.time()
+        self.deadline = self.started_at + seconds
+        self.costs = {stage: max(cost, STAGE_TIME_LIMITS.get(stage, 0))
+                      for stage, cost in jobqueue.stage_costs().items()}
+        past_publish = jobqueue.publish_seconds()
+        self.publish_reserve = max(MIN_PUBLISH_RESERVE, PUBLISH_SAFETY_FACTOR * (past_publish or 0))
+        logger.info(
+            f"Run budget {seconds:.0f}s, {self.publish_reserve:.0f}s reserved for publishing; "
+            f"stage costs: " + ", ".join(f"{stage} {cost:.1f}s" for stage, cost in self.costs.items())
+        )
+
+    def remaining(self):
+        """Seconds left for pipeline work, after the publishing reserve."""
+        return self.deadline - time.time() - self.publish_reserve
+
+    def allowed_stages(self, stages=jobqueue.STAGES):
+        """The stages whose slowest expected job still finishes within the budget."""
+        remaining = self.remaining()
+        return [stage for stage in stages if self.costs.get(stage, 0) <= remaining]
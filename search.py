@@ -0,0 +1,73 @@
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+
+import db
+import feed
+import sources
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over stored articles.")
+    parser.add_argument("query", nargs="?", default=None,
+                        help="Search terms (title, summary, tags, author, content)")
+    parser.add_argument("--tag", action="append", dest="tags", default=[],
+                        help="Only articles with this tag (repeatable)")
+    parser.add_argument("--domain", help="Only articles from this source domain")
+    parser.add_argument("--since", help="Crawled on or after YYYY-MM-DD")
+    parser.add_argument("--until", help="Crawled on or before YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--order", choices=["rank", "recent"], default="rank")
+    parser.add_argument("--include-spam", action="store_true")
+    parser.add_argument("--raw", action="store_true",
+                        help="Pass the query to FTS5 unquoted (AND/OR/NOT, prefix*, column:term)")
+    parser.add_argument("--rss", metavar="OUTPUT_FILE",
+                        help="Write the results as an RSS feed instead of printing them")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Creates the search index on first use against an existing archive
+    db.init_db()
+
+    started = time.perf_counter()
+    try:
+        rows = db.search_articles(
+            query=args.query,
+            tags=args.tags,
+            domain=args.domain,
+            since=args.since,
+            until=args.until,
+            limit=args.limit,
+            order=args.order,
+            include_spam=args.include_spam,
+            raw=args.raw,
+        )
+    except sqlite3.OperationalError as e:
+        logger.error(f"Search failed: {e}")
+        return 1
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.rss:
+        title = f"{feed.FEED_TITLE}: {args.query or ', '.join(args.tags) or args.domain or 'search'}"
+        feed.write_feed(rows, args.rss, link=sources.DEFAULT_SOURCE['url'], title=title)
+        return 0
+
+    for row in rows:
+        print(f"{row['crawl_date']}  {row['title']}")
+        print(f"    {row['article_source_domain']}  tags: {row['tags']}")
+        print(f"    {row['original_link']}")
+        if row['snippet']:
+            print(f"    {row['snippet']}")
+        print()
+    print(f"{len(rows)} results in {elapsed_ms:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
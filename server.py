@@ -0,0 +1,327 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import db
+import feed
+import sources
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+FEED_PATHS = ("/", "/feed.xml", "/output.xml")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Views are queried and their items rendered at one of these sizes; a request
+# for fewer items is assembled from the first items of the next size up
+LIMIT_BUCKETS = (10, 25, 50, 100, 200, MAX_LIMIT)
+# Distinct (limit, tag) views kept assembled, and (bucket, tag) item sets kept
+# rendered; the least recently used are dropped beyond these
+MAX_VIEWS = 256
+MAX_ITEM_SETS = 64
+# Views re-rendered eagerly when the database changes; the rest render again on next request
+REFRESH_VIEWS = 16
+
+RenderedFeed = namedtuple("RenderedFeed", ["body", "gzip_body", "br_body", "etag"])
+# The newest rows of one query, rendered once as <item> fragments, with their crawl dates
+ItemSet = namedtuple("ItemSet", ["title", "link", "fragments", "crawl_dates"])
+
+def bucket_limit(limit):
+    """Rounds a requested item count up to the nearest queried item set size."""
+    for bucket in LIMIT_BUCKETS:
+        if limit <= bucket:
+            return bucket
+    return MAX_LIMIT
+
+def render_items(bucket, tag=None):
+    """
+    Queries up to bucket articles and renders each into its <item> fragment.
+    Without a tag these are the first configured source's rows, the same
+    ones main.py publishes to that source's output.xml.
+    """
+    source = sources.load_sources()[0]
+    if tag:
+        rows = db.search_articles(tags=[tag], order="recent", limit=bucket)
+        title = f"{feed.FEED_TITLE}: {tag}"
+    else:
+        rows = db.get_source_feed_rows(limit=bucket, source_name=source['name']).get(source['name'], [])
+        title = source['title']
+    return ItemSet(title, source['url'], [feed.render_item(row) for row in rows],
+                   [feed.crawl_datetime(row) for row in rows])
+
+def render_view(items, limit):
+    """Assembles the first limit items into identity, gzip and brotli bodies."""
+    crawl_dates = [d for d in items.crawl_dates[:limit] if d]
+    body = feed.assemble_feed(items.fragments[:limit], link=items.link, title=items.title,
+                              last_build=max(crawl_dates) if crawl_dates else None)
+    etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    # mtime=0 keeps the compressed bytes stable for identical feeds
+    gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+    br_body = feed.brotli.compress(body, quality=feed.BROTLI_QUALITY) if feed.brotli is not None else None
+    return RenderedFeed(body, gzip_body, br_body, etag)
+
+class FeedCache:
+    """
+    Holds rendered feed views in memory, least recently used first.
+    Each view is assembled from an item set queried at its bucket size, so a
+    view of any exact size costs no extra query. refresh() renders a
+    replacement set of views and swaps it in, so readers never see a
+    half-updated set. Anything missing from the cache is rendered once,
+    however many requests for it arrive while it renders.
+    """
+
+    def __init__(self, max_views=MAX_VIEWS, refresh_views=REFRESH_VIEWS, max_item_sets=MAX_ITEM_SETS):
+        self.max_views = max_views
+        self.max_item_sets = max_item_sets
+        self.refresh_views = refresh_views
+        self._views = OrderedDict()
+        self._item_sets = OrderedDict()
+        self._tags = frozenset()
+        self._rendering = {}
+        self._lock = threading.Lock()
+
+    def is_known_tag(self, tag):
+        return tag.lower() in self._tags
+
+    def _get_or_build(self, store_name, key, build, max_size):
+        with self._lock:
+            store = getattr(self, store_name)
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+                return value
+            # Single flight: later requests for this key wait for the first one's render
+            done = self._rendering.get((store_name, key))
+            owner = done is None
+            if owner:
+                done = self._rendering[(store_name, key)] = threading.Event()
+
+        if not owner:
+            done.wait()
+            return self._get_or_build(store_name, key, build, max_size)
+
+        try:
+            value = build()
+            with self._lock:
+                if store is getattr(self, store_name):
+                    store[key] = value
+                    while len(store) > max_size:
+                        store.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                del self._rendering[(store_name, key)]
+            done.set()
+
+    def get(self, limit, tag=None):
+        bucket = bucket_limit(limit)
+        def build():
+            items = self._get_or_build("_item_sets", (bucket, tag), lambda: render_items(bucket, tag),
+                                       self.max_item_sets)
+            return render_view(items, limit)
+        return self._get_or_build("_views", (limit, tag), build, self.max_views)
+
+    def refresh(self):
+        """Re-renders the default view and the most recently used views, then swaps them in."""
+        started = time.perf_counter()
+        tags = frozenset(db.get_tag_names())
+        default_key = (DEFAULT_LIMIT, None)
+        recent = [key for key in reversed(self._views.keys()) if key != default_key]
+        keys = [default_key] + recent[:self.refresh_views - 1]
+
+        item_sets = OrderedDict()
+        views = OrderedDict()
+        # Oldest first, so the cache keeps its recency order
+        for limit, tag in reversed(keys):
+            bucket = bucket_limit(limit)
+            try:
+                items = item_sets.get((bucket, tag))
+                if items is None:
+                    items = item_sets[(bucket, tag)] = render_items(bucket, tag)
+                views[(limit, tag)] = render_view(items, limit)
+            except Exception as e:
+                logger.error(f"Failed to render view limit={limit} tag={tag}: {e}")
+
+        with self._lock:
+            self._item_sets = item_sets
+            self._views = views
+            self._tags = tags
+        logger.info(f"Refreshed {len(views)} feed views in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def watch_database(cache, poll_interval, stop_event):
+    """
+    Refreshes the cache whenever another connection adds or removes articles.
+    PRAGMA data_version cheaply tells when anything was committed, but the
+    job queue in the same file commits on every claim and heartbeat, so the
+    articles themselves are only compared after it changes.
+    """
+    conn = sqlite3.connect(db.DB_PATH, check_same_thread=False)
+    try:
+        last_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        last_articles = db.get_articles_version()
+        while not stop_event.wait(poll_interval):
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == last_version:
+                continue
+            last_version = version
+            articles = db.get_articles_version()
+            if articles != last_articles:
+                last_articles = articles
+                cache.refresh()
+    finally:
+        conn.close()
+
+def run_pipeline_periodically(interval, stop_event):
+    # Imported lazily so serving alone doesn't need the crawling dependencies
+    import main
+    while not stop_event.is_set():
+        try:
+            main.process_sources(sources.load_sources())
+        except Exception as e:
+            logger.error(f"Pipeline run failed: {e}")
+        stop_event.wait(interval)
+
+def make_handler(cache):
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self._serve(send_body=True)
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def _serve(self, send_body):
+            parsed = urlparse(self.path)
+            if parsed.path not in FEED_PATHS:
+                self._send_error(404, "Not Found")
+                return
+
+            params = parse_qs(parsed.query)
+            tag = params.get("tag", [None])[0] or None
+            try:
+                limit = int(params.get("limit", [DEFAULT_LIMIT])[0])
+            except ValueError:
+                self._send_error(400, "limit must be an integer")
+                return
+            if not 1 <= limit <= MAX_LIMIT:
+                self._send_error(400, f"limit must be between 1 and {MAX_LIMIT}")
+                return
+            if tag is not None:
+                if not cache.is_known_tag(tag):
+                    self._send_error(404, "Unknown tag")
+                    return
+                tag = tag.lower()
+
+            try:
+                rendered = cache.get(limit, tag)
+            except Exception as e:
+                logger.error(f"Failed to render feed: {e}")
+                self._send_error(500, "Failed to render feed")
+                return
+
+            if self._etag_matches(rendered.etag):
+                self.send_response(304)
+                self.send_header("ETag", rendered.etag)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return
+
+            accepted = {
+                coding.split(";")[0].strip().lower()
+                for coding in self.headers.get("Accept-Encoding", "").split(",")
+            }
+            if rendered.br_body is not None and "br" in accepted:
+                encoding, body = "br", rendered.br_body
+            elif "gzip" in accepted:
+                encoding, body = "gzip", rendered.gzip_body
+            else:
+                encoding, body = None, rendered.body
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", rendered.etag)
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def _etag_matches(self, etag):
+            header = self.headers.get("If-None-Match")
+            if not header:
+                return False
+            if header.strip() == "*":
+                return True
+            # Weak comparison: proxies may strip or add the W/ prefix
+            opaque = etag.removeprefix("W/")
+            return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+        def _send_error(self, code, message):
+            body = message.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return FeedHandler
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the curated feed from memory.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="Seconds between checks for newly committed articles")
+    parser.add_argument("--run-every", type=float, default=None, metavar="SECONDS",
+                        help="Also run the crawl pipeline in-process at this interval")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    db.init_db()
+    cache = FeedCache()
+    cache.refresh()
+
+    stop_event = threading.Event()
+    threading.Thread(
+        target=watch_database, args=(cache, args.poll_interval, stop_event), daemon=True
+    ).start()
+    if args.run_every:
+        threading.Thread(
+            target=run_pipeline_periodically, args=(args.run_every, stop_event), daemon=True
+        ).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cache))
+    logger.info(f"Serving feed on http://{args.host}:{args.port}/feed.xml")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import logging
+import os
+import sys
+
+import db
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Save articles.db as append-only text changesets, or rebuild it from them."
+    )
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--dir", default=db.SNAPSHOT_DIR, help=f"Snapshot directory (default {db.SNAPSHOT_DIR})")
+    parser.add_argument("--db", default=db.DB_PATH, help=f"Database file (default {db.DB_PATH})")
+    parser.add_argument("--force", action="store_true", help="import: replace an existing database")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        if not os.path.exists(args.db):
+            logger.error(f"No database at {args.db}")
+            return 1
+        db.export_snapshot(args.dir, args.db)
+        return 0
+
+    if os.path.exists(args.db) and not args.force:
+        logger.info(f"{args.db} already exists; keeping it (use --force to rebuild it from {args.dir})")
+        return 0
+    db.import_snapshot(args.dir, args.db)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import math
+import os
+import re
+
+import lxml.html
+
+# Token budget for the article text sent to Gemini, estimated locally
+SNIPPET_TOKEN_BUDGET = int(os.environ.get("SNIPPET_TOKEN_BUDGET", "700"))
+# Rough chars-per-token ratio for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Whole lines that are page furniture rather than article text. Only dropped
+# when the text is over budget, and matched against the entire line so
+# sentences that merely mention one of these words are kept.
+FURNITURE = re.compile(
+    r"(skip )?advertisement|story continues below( advertisement)?|"
+    r"share( this)?( article| story| post)?|print|email|copy link|"
+    r"(read more|related( articles| stories)?|recommended( for you)?|more from [^.!?]{1,40}|"
+    r"follow us( on [^.!?]{1,40})?)\s*:?|"
+    r"(privacy|cookie) policy|terms of (use|service)|log ?in|sign ?in|"
+    r"((©|\(c\)|copyright)\s*)?[^.!?]{0,80}\ball rights reserved\.?|(©|\(c\)|copyright ©?) ?\d{4}.{0,80}|"
+    r"(photo|image|illustration)s?( courtesy( of)?| credit| by)?: [^.!?]{0,80}|"
+    r"we use cookies\b.*|(accept|manage) (all )?cookies",
+    re.IGNORECASE
+)
+# Author and dateline lines ("By Jane Doe", "Updated 3:14 PM EST, June 2")
+BYLINE = re.compile(
+    r"(?i:(written |posted )?by) [A-Z][\w.'-]*( [A-Z][\w.'-]*){0,3}((,| and) [A-Z][\w.'-]*( [A-Z][\w.'-]*){0,3})*"
+    r"|(?i:(updated|published)( on)?:? [^.!?]{0,50}\d[^!?]{0,30})"
+)
+# Subscription and sponsorship calls to action: the analysis prompt tags them
+# as spam, so one is always kept in the snippet
+PROMO = re.compile(r"\b(subscribe|sign up|newsletter|sponsored|paid (post|partnership))\b",
+                   re.IGNORECASE)
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=["\'“(\[]?[A-Z0-9])')
+WORD = re.compile(r"[a-z][a-z0-9'-]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most my
+no nor not now of off on once only or other our out over own said same says she should so some
+such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your
+""".split())
+
+BLOCK_TAGS = ('p', 'div', 'li', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'tr', 'figcaption')
+
+def html_to_text(html):
+    """Approximates newspaper's article.text for stored HTML: block elements become separate lines."""
+    if not html or not html.strip():
+        return ""
+    doc = lxml.html.fromstring(html)
+    for element in doc.iter(*BLOCK_TAGS):
+        element.tail = "\n" + (element.tail or "")
+    return doc.text_content()
+
+def estimate_tokens(text):
+    """Cheap local token estimate, good enough for budgeting prompts."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def content_words(text):
+    return [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+
+def clean_lines(text):
+    """Splits text into lines, dropping blanks and exact repeats."""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+def is_furniture(line):
+    return bool(FURNITURE.fullmatch(line) or BYLINE.fullmatch(line))
+
+def build_snippet(title, text, budget=SNIPPET_TOKEN_BUDGET):
+    """
+    Compresses article text to roughly budget tokens for the Gemini prompt.
+
+    Text that fits is sent whole, minus blank and repeated lines. Otherwise
+    page furniture (share buttons, copyright lines, bylines, ...) is dropped,
+    and if the rest still does not fit, sentences are scored by how many of
+    the article's frequent content words (and title words) they contain,
+    with a bonus for the lead, and the best ones are kept in their original
+    order. The first subscribe/sponsored line always survives, since the
+    prompt relies on it to tag promotional pages as spam.
+    """
+    lines = clean_lines(text or "")
+    cleaned = "\n".join(lines)
+    if estimate_tokens(cleaned) <= budget:
+        return cleaned
+
+    lines = [line for line in lines if not is_furniture(line)]
+    cleaned = "\n".join(lines)
+    if estimate_tokens(cleaned) <= budget:
+        return cleaned
+
+    sentences = []
+    for line in lines:
+        sentences.extend(s.strip() for s in SENTENCE_SPLIT.split(line) if s.strip())
+
+    term_counts = {}
+    for sentence in sentences:
+        for word in set(content_words(sentence)):
+            term_counts[word] = term_counts.get(word, 0) + 1
+    title_words = set(content_words(title or ""))
+
+    scored = []
+    for position, sentence in enumerate(sentences):
+        words = set(content_words(sentence))
+        if len(words) < 3:
+            continue
+        # Words repeated across the article carry its topic; one-offs are mostly noise
+        score = sum(math.log(term_counts[w]) + (1.0 if w in title_words else 0.0) for w in words)
+        score /= math.sqrt(len(words))
+        # News writing front-loads the key facts
+        score *= 1.0 + 1.0 / (1 + position / 3)
+        scored.append((score, position, sentence))
+
+    chosen = []
+    used = 0
+    promo = next(((position, sentence) for position, sentence in enumerate(sentences)
+                  if PROMO.search(sentence) and estimate_tokens(sentence) < budget // 4), None)
+    if promo:
+        chosen.append(promo)
+        used += estimate_tokens(promo[1]) + 1
+    for score, position, sentence in sorted(scored, reverse=True):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > budget or (promo and position == promo[0]):
+            continue
+        chosen.append((position, sentence))
+        used += cost
+
+    if not chosen:
+        # Nothing sentence-shaped fit (e.g. one huge unpunctuated block)
+        return cleaned[:budget * CHARS_PER_TOKEN]
+    return " ".join(sentence for _, sentence in sorted(chosen))
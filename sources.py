@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+
+import db
+
+logger = logging.getLogger(__name__)
+
+SOURCES_PATH = "sources.json"
+
+# Used when no sources.json exists, matching the original single-inbox setup
+DEFAULT_SOURCE = {
+    "name": db.LEGACY_SOURCE_NAME,
+    "url": "https://kill-the-newsletter.com/feeds/km69ge1d7gq6c4rhg5uv.xml",
+    "output": "output.xml",
+    "fallback": "sample-input/km69ge1d7gq6c4rhg5uv.xml",
+}
+
+# Per-tag / per-domain / per-newsletter feeds published alongside the source feeds.
+# Off by default: with every topic enabled they run to hundreds of files.
+DEFAULT_TOPIC_FEEDS = {
+    "enabled": False,
+    "dir": "feeds",
+    "tags": True,
+    "domains": True,
+    "newsletters": True,
+    # Topics with fewer items than this in the candidate window get no feed
+    "min_items": 3,
+    "limit": 50,
+    # Topic feed items carry the summary only unless this is set
+    "full_content": False,
+    # How many recent articles are read once and fanned out to every feed
+    "candidates": 2000,
+    "link": DEFAULT_SOURCE["url"],
+}
+
+def _with_defaults(source):
+    source = dict(source)
+    source.setdefault("output", f"output-{source['name']}.xml")
+    source.setdefault("title", "Curated Email Articles")
+    source.setdefault("limit", 50)
+    source.setdefault("fallback", None)
+    filters_config = dict(source.get("filters") or {})
+    filters_config.setdefault("blocked_domains", [])
+    filters_config.setdefault("blocked_substrings", [])
+    source["filters"] = filters_config
+    return source
+
+def load_sources(path=SOURCES_PATH):
+    """
+    Loads the list of newsletter feeds to process.
+
+    Each source needs a unique 'name' and a 'url'. Optional keys: 'output'
+    (feed file to write), 'title', 'limit' (items in the output feed),
+    'fallback' (local XML used when the feed can't be fetched) and 'filters'
+    with extra 'blocked_domains' / 'blocked_substrings' for LinkFilter.
+    """
+    if not os.path.exists(path):
+        logger.info(f"No {path} found, using the default source")
+        return [_with_defaults(DEFAULT_SOURCE)]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    sources = []
+    seen_names = set()
+    outputs = set()
+    for raw in config.get("sources", []):
+        if not raw.get("name") or not raw.get("url"):
+            raise ValueError(f"Source entries need a 'name' and a 'url': {raw}")
+        if raw["name"] in seen_names:
+            raise ValueError(f"Duplicate source name: {raw['name']}")
+        source = _with_defaults(raw)
+        if source["output"] in outputs:
+            raise ValueError(f"Duplicate output file: {source['output']}")
+        seen_names.add(source["name"])
+        outputs.add(source["output"])
+        sources.append(source)
+
+    if not sources:
+        raise ValueError(f"{path} does not list any sources")
+    return sources
+
+def load_topic_feeds(path=SOURCES_PATH):
+    """Loads the optional 'topic_feeds' section of the sources file, filling in defaults."""
+    topic_config = dict(DEFAULT_TOPIC_FEEDS)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            topic_config.update(json.load(f).get("topic_feeds") or {})
+    return topic_config
@@ -0,0 +1,227 @@
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+import zlib
+
+import numpy as np
+
+import db
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "spam_model.npz"
+# 2^18 hashed features: collisions are rare at this vocabulary size and the model stays ~2 MB
+N_FEATURES = 2 ** 18
+# Only this much of each article is looked at, in training and scoring alike
+MAX_TEXT_CHARS = 5000
+# Articles are only skipped when the held-out precision at the chosen threshold reaches this,
+# judged by its one-sided 95% lower confidence bound so a handful of lucky hits cannot pass
+TARGET_PRECISION = 0.98
+PRECISION_CONFIDENCE_Z = 1.645
+# ...and at least this many held-out spam articles score above the threshold
+MIN_TRUE_POSITIVES = 20
+# Every HOLDOUT_MODULO-th article (by URL hash) is held out for evaluation
+HOLDOUT_MODULO = 5
+# Tag added to articles skipped by this model; they are left out of retraining
+PREFILTER_TAG = "prefiltered"
+# Gemini fallbacks in gemini.analyze_article: these rows were never labelled
+UNLABELLED_SUMMARIES = ("Gemini API not configured.", "Error generating summary.")
+
+TOKEN = re.compile(r"[a-z0-9][a-z0-9'$%-]*")
+
+def _hash(feature):
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode('utf-8')) % N_FEATURES
+
+def features(title, text, domain):
+    """Hashed unigram, bigram, title and domain features for one article."""
+    tokens = TOKEN.findall((text or "")[:MAX_TEXT_CHARS].lower())
+    feats = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    feats += [f"title:{t}" for t in TOKEN.findall((title or "").lower())]
+    if domain:
+        feats.append(f"domain:{domain.lower()}")
+    return np.fromiter((_hash(f) for f in feats), dtype=np.int64, count=len(feats))
+
+class SpamModel:
+    """Multinomial naive Bayes over hashed features."""
+
+    def __init__(self, log_probs=None, log_priors=None, threshold=float('inf')):
+        # log_probs: shape (2, N_FEATURES), row 0 = ham, row 1 = spam
+        self.log_probs = log_probs
+        self.log_priors = log_priors
+        self.threshold = threshold
+
+    def fit(self, feature_rows, labels, alpha=1.0):
+        labels = np.asarray(labels, dtype=bool)
+        counts = np.zeros((2, N_FEATURES), dtype=np.float64)
+        for cls in (0, 1):
+            rows = [f for f, label in zip(feature_rows, labels) if label == cls]
+            if rows:
+                counts[cls] = np.bincount(np.concatenate(rows), minlength=N_FEATURES)
+        smoothed = counts + alpha
+        self.log_probs = (np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))).astype(np.float32)
+        class_counts = np.array([(~labels).sum(), labels.sum()], dtype=np.float64) + 1.0
+        self.log_priors = np.log(class_counts / class_counts.sum())
+        return self
+
+    def log_odds(self, feature_ids):
+        """
+        Spam vs ham log-odds. Used as the score instead of a probability because
+        naive Bayes probabilities saturate at 0/1 on long texts, losing the ranking.
+        """
+        if len(feature_ids) == 0:
+            return float(self.log_priors[1] - self.log_priors[0])
+        ids, counts = np.unique(feature_ids, return_counts=True)
+        scores = self.log_priors + self.log_probs[:, ids] @ counts
+        return float(scores[1] - scores[0])
+
+    def scores(self, feature_rows):
+        return np.array([self.log_odds(f) for f in feature_rows])
+
+    def save(self, path=MODEL_PATH):
+        np.savez_compressed(path, log_probs=self.log_probs, log_priors=self.log_priors,
+                            threshold=np.array(self.threshold))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            return cls(data['log_probs'], data['log_priors'], float(data['threshold']))
+
+_model = None
+_model_loaded = False
+
+def get_model(path=MODEL_PATH):
+    """Returns the saved model, or None if none has been trained. Loaded once per process."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        try:
+            _model = SpamModel.load(path)
+            logger.info(f"Loaded spam pre-filter from {path} (threshold {_model.threshold:.1f})")
+        except FileNotFoundError:
+            _model = None
+        except Exception as e:
+            logger.warning(f"Failed to load spam model {path}: {e}")
+            _model = None
+        _model_loaded = True
+    return _model
+
+def spam_score(title, content, domain):
+    """
+    Spam log-odds for an article from its content HTML, or None when no model
+    is available. The text goes through db.content_text, as in training.
+    """
+    model = get_model()
+    if model is None:
+        return None
+    return model.log_odds(features(title, db.content_text(content), domain))
+
+def is_confident_spam(score):
+    model = get_model()
+    return model is not None and score is not None and score >= model.threshold
+
+def load_examples(db_path=None):
+    """Reads Gemini-labelled articles: (features, is_spam, is_holdout) per article."""
+    conn = sqlite3.connect(db_path or db.DB_PATH)
+    rows = conn.execute(
+        "SELECT title, content, content_text, article_source_domain, tags, summary, original_link FROM articles"
+    ).fetchall()
+    conn.close()
+
+    examples = []
+    for title, content, text, domain, tags, summary, link in rows:
+        tag_set = {t.strip().lower() for t in (tags or "").split(',') if t.strip()}
+        if PREFILTER_TAG in tag_set or (not tag_set and summary in UNLABELLED_SUMMARIES):
+            continue
+        if text is None:
+            text = db.content_text(content)
+        holdout = zlib.crc32((link or "").encode('utf-8')) % HOLDOUT_MODULO == 0
+        examples.append((features(title, text, domain), 'spam' in tag_set, holdout))
+    return examples
+
+def precision_lower_bound(true_positives, predicted, z=PRECISION_CONFIDENCE_Z):
+    """Wilson score lower bound on precision given true_positives out of predicted positives."""
+    predicted = np.asarray(predicted, dtype=float)
+    p = np.asarray(true_positives, dtype=float) / predicted
+    z2 = z * z
+    centre = p + z2 / (2 * predicted)
+    margin = z * np.sqrt(p * (1 - p) / predicted + z2 / (4 * predicted * predicted))
+    return (centre - margin) / (1 + z2 / predicted)
+
+def choose_threshold(scores, labels, target_precision=TARGET_PRECISION, min_true_positives=MIN_TRUE_POSITIVES):
+    """
+    Lowest score threshold at which held-out precision is confidently at least
+    target_precision, backed by at least min_true_positives spam articles
+    (inf disables skipping).
+    """
+    order = np.argsort(-scores)
+    sorted_scores = scores[order]
+    sorted_labels = labels[order]
+    true_positives = np.cumsum(sorted_labels)
+    precision = precision_lower_bound(true_positives, np.arange(1, len(sorted_labels) + 1))
+
+    threshold = float('inf')
+    for i in range(len(sorted_scores)):
+        # Only cut between distinct scores, otherwise ties would be split
+        if i + 1 < len(sorted_scores) and sorted_scores[i + 1] == sorted_scores[i]:
+            continue
+        if precision[i] >= target_precision and true_positives[i] >= min_true_positives and sorted_labels[i]:
+            threshold = float(sorted_scores[i])
+    return threshold
+
+def report(scores, labels, threshold):
+    predicted = scores >= threshold
+    tp = int((predicted & labels).sum())
+    fp = int((predicted & ~labels).sum())
+    fn = int((~predicted & labels).sum())
+    precision = tp / (tp + fp) if tp + fp else float('nan')
+    lower = float(precision_lower_bound(tp, tp + fp)) if tp + fp else float('nan')
+    recall = tp / (tp + fn) if tp + fn else float('nan')
+    print(f"Held-out articles: {len(labels)} ({int(labels.sum())} spam)")
+    print(f"Threshold (log-odds): {threshold:.1f}")
+    print(f"Precision: {precision:.3f} (lower bound {lower:.3f})  Recall: {recall:.3f}  (tp={tp} fp={fp} fn={fn})")
+    print(f"Gemini calls saved: {int(predicted.sum())}/{len(labels)} ({predicted.mean():.1%})")
+    print(f"Non-spam articles wrongly skipped: {fp}")
+
+def train(db_path=None, model_path=MODEL_PATH, target_precision=TARGET_PRECISION):
+    examples = load_examples(db_path)
+    train_set = [(f, y) for f, y, holdout in examples if not holdout]
+    test_set = [(f, y) for f, y, holdout in examples if holdout]
+    if not train_set or not test_set:
+        logger.error(f"Not enough labelled articles to train ({len(examples)} found)")
+        return None
+
+    model = SpamModel().fit([f for f, _ in train_set], [y for _, y in train_set])
+    labels = np.array([y for _, y in test_set], dtype=bool)
+    scores = model.scores([f for f, _ in test_set])
+    model.threshold = choose_threshold(scores, labels, target_precision)
+
+    print(f"Training articles: {len(train_set)} ({sum(y for _, y in train_set)} spam)")
+    report(scores, labels, model.threshold)
+    model.save(model_path)
+    print(f"Saved model to {model_path}")
+    return model
+
+def evaluate(db_path=None, model_path=MODEL_PATH):
+    model = SpamModel.load(model_path)
+    test_set = [(f, y) for f, y, holdout in load_examples(db_path) if holdout]
+    labels = np.array([y for _, y in test_set], dtype=bool)
+    report(model.scores([f for f, _ in test_set]), labels, model.threshold)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Local spam pre-filter trained from Gemini's tags.")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--db", default=None, help=f"Database to read (default {db.DB_PATH})")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--target-precision", type=float, default=TARGET_PRECISION)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        return 0 if train(args.db, args.model, args.target_precision) else 1
+    evaluate(args.db, args.model)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh articles database (with the job queue) that db and jobqueue use."""
+    path = str(tmp_path / "articles.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    return path
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.time with a clock the test moves forward by hand."""
+    fake = Clock()
+    monkeypatch.setattr("time.time", fake)
+    return fake
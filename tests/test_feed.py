@@ -0,0 +1,69 @@
+import gzip
+import os
+
+import feed
+
+
+def test_precompress_feeds_writes_copies_only_when_stale(tmp_path):
+    topic = tmp_path / "feeds" / "tag"
+    topic.mkdir(parents=True)
+    (topic / "ai.xml").write_bytes(b"<rss>" + b"<item/>" * 100 + b"</rss>")
+    (tmp_path / "feeds" / "notes.txt").write_text("not a feed")
+
+    assert feed.precompress_feeds([str(tmp_path / "feeds")]) == 1
+    assert gzip.decompress((topic / "ai.xml.gz").read_bytes()) == (topic / "ai.xml").read_bytes()
+    assert not (tmp_path / "feeds" / "notes.txt.gz").exists()
+    assert feed.precompress_feeds([str(tmp_path / "feeds")]) == 0
+
+    (topic / "ai.xml").write_bytes(b"<rss></rss>")
+    later = os.path.getmtime(topic / "ai.xml.gz") + 10
+    os.utime(topic / "ai.xml", (later, later))
+    assert feed.precompress_feeds([str(topic / "ai.xml")]) == 1
+    assert gzip.decompress((topic / "ai.xml.gz").read_bytes()) == b"<rss></rss>"
+
+
+def article_row(i, tags="ai"):
+    return {
+        'id': i, 'title': f'Story {i}', 'original_link': f'https://example.com/{i}',
+        'article_source_domain': 'example.com', 'email_source': 'Morning Brief',
+        'author': 'Staff', 'reading_time': 3, 'summary': f'Summary {i}.', 'tags': tags,
+        'image_url': '', 'content': f'<p>FULL ARTICLE BODY {i}</p>',
+        'published_date': '2026-01-01T00:00:00+00:00', 'crawl_date': '2026-01-01 00:00:00',
+    }
+
+
+def test_topic_feeds_carry_summaries_only(tmp_path):
+    rows = [article_row(i) for i in range(3)]
+    source = {'name': 'default', 'output': str(tmp_path / 'output.xml'), 'title': 'Feed',
+              'url': 'https://example.com/feed', 'limit': 50}
+    topic_config = {'enabled': True, 'dir': str(tmp_path / 'feeds'), 'tags': True, 'domains': False,
+                    'newsletters': False, 'min_items': 3, 'limit': 50, 'full_content': False,
+                    'link': 'https://example.com/feed'}
+    specs = feed.plan_feeds(rows, {'default': rows}, [source], topic_config)
+    feed.publish_feeds(specs)
+
+    for path in ('output.xml', 'output.atom', 'output.json'):
+        assert 'FULL ARTICLE BODY 0' in (tmp_path / path).read_text()
+    for path in ('ai.xml', 'ai.atom', 'ai.json'):
+        text = (tmp_path / 'feeds' / 'tag' / path).read_text()
+        assert 'Summary 0.' in text
+        assert 'FULL ARTICLE BODY' not in text
+
+
+def test_prune_only_touches_generated_topic_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = [article_row(i) for i in range(3)]
+    topic_config = {'enabled': True, 'dir': '.', 'tags': True, 'domains': False,
+                    'newsletters': False, 'min_items': 3, 'limit': 50, 'full_content': False,
+                    'link': 'https://example.com/feed'}
+    specs = feed.plan_feeds(rows, {}, [], topic_config)
+    feed.publish_feeds(specs)
+    (tmp_path / 'tag' / 'stale.xml').write_text('<rss/>')
+    (tmp_path / 'tag' / 'stale.xml.gz').write_bytes(b'')
+    for name in ('output.xml', 'output.json', 'sources.json'):
+        (tmp_path / name).write_text('keep')
+
+    assert feed.prune_topic_feeds('.', specs) == 2
+    assert sorted(os.listdir(tmp_path / 'tag')) == ['ai.atom', 'ai.json', 'ai.xml']
+    for name in ('output.xml', 'output.json', 'sources.json'):
+        assert (tmp_path / name).read_text() == 'keep'
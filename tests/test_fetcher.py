@@ -0,0 +1,52 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import fetcher
+
+
+class TrickleHandler(BaseHTTPRequestHandler):
+    """Serves an HTML page a few bytes at a time, never slower than the read timeout."""
+
+    def do_GET(self):
+        body = b"<html><body>" + b"x" * 200 + b"</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 4):
+                self.wfile.write(body[i:i + 4])
+                self.wfile.flush()
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def trickle_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TrickleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_deadline_stops_a_trickling_download(trickle_url):
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        fetcher.fetch_html(trickle_url, timeout=(1, 1), deadline=0.3)
+    # Well within one 64 KB chunk, but the deadline is checked after every read
+    assert time.monotonic() - started < 1
+
+
+def test_slow_download_within_deadline_is_returned(trickle_url):
+    html = fetcher.fetch_html(trickle_url, timeout=(1, 1), deadline=10)
+    assert html.startswith("<html><body>xxxx")
+    assert html.endswith("</body></html>")
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+import jobqueue
+from jobqueue import NextJob
+
+
+def job_rows(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = {(row['stage'], row['job_key']): row for row in conn.execute("SELECT * FROM jobs")}
+    conn.close()
+    return rows
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(database, clock):
+    jobqueue.enqueue('fetch', 'https://example.com/a', {'url': 'https://example.com/a'})
+    first = jobqueue.claim('worker-1', lease_seconds=60)
+    assert first.attempts == 1
+
+    # Still leased: nobody else can take it
+    clock.advance(30)
+    assert jobqueue.claim('worker-2', lease_seconds=60) is None
+
+    # worker-1 stops heartbeating and the lease runs out
+    clock.advance(31)
+    second = jobqueue.claim('worker-2', lease_seconds=60)
+    assert second.id == first.id
+    assert second.attempts == 2
+    assert second.payload == {'url': 'https://example.com/a'}
+
+    # The old owner has lost the job: it can neither extend nor finish it
+    assert not jobqueue.heartbeat(first, 'worker-1')
+    assert not jobqueue.complete(first, 'worker-1', [NextJob('extract', 'https://example.com/a', {'html': 'x'})])
+    assert ('extract', 'https://example.com/a') not in job_rows(database)
+
+    assert jobqueue.complete(second, 'worker-2', [NextJob('extract', 'https://example.com/a', {'html': 'y'})])
+    rows = job_rows(database)
+    assert rows[('fetch', 'https://example.com/a')]['status'] == 'done'
+    assert rows[('extract', 'https://example.com/a')]['payload'] == '{"html": "y"}'
+
+
+def test_heartbeat_keeps_the_lease(database, clock):
+    jobqueue.enqueue('analyze', 'k', {})
+    job = jobqueue.claim('worker-1', lease_seconds=60)
+    for _ in range(3):
+        clock.advance(45)
+        assert jobqueue.heartbeat(job, 'worker-1', lease_seconds=60)
+    assert jobqueue.claim('worker-2', lease_seconds=60) is None
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(database, clock):
+    jobqueue.enqueue('fetch', 'k', {})
+    for attempt in range(jobqueue.MAX_ATTEMPTS):
+        assert jobqueue.claim(f'worker-{attempt}', lease_seconds=60) is not None
+        clock.advance(61)
+    assert jobqueue.claim('worker-last', lease_seconds=60) is None
+    row = job_rows(database)[('fetch', 'k')]
+    assert row['status'] == 'failed'
+    assert row['last_error'] == 'lease expired'
+
+
+def test_complete_is_atomic_with_its_follow_up_jobs(database, clock):
+    jobqueue.enqueue('discover', 'email', {'html': '<a href="x">'})
+    job = jobqueue.claim('worker-1')
+    follow_ups = [
+        NextJob('fetch', 'https://example.com/1', {'url': 'https://example.com/1'}),
+        # Not JSON-serializable: inserting it raises halfway through complete()
+        NextJob('fetch', 'https://example.com/2', {'url': object()}),
+    ]
+    with pytest.raises(TypeError):
+        jobqueue.complete(job, 'worker-1', follow_ups)
+
+    # Neither the status change nor the first follow-up was committed
+    rows = job_rows(database)
+    assert rows[('discover', 'email')]['status'] == 'running'
+    assert rows[('discover', 'email')]['payload'] is not None
+    assert ('fetch', 'https://example.com/1') not in rows
+
+    assert jobqueue.complete(job, 'worker-1', follow_ups[:1])
+    rows = job_rows(database)
+    assert rows[('discover', 'email')]['status'] == 'done'
+    assert rows[('discover', 'email')]['payload'] is None
+    assert rows[('fetch', 'https://example.com/1')]['status'] == 'pending'
+
+
+def test_failed_job_waits_for_its_retry_delay(database, clock):
+    jobqueue.enqueue('fetch', 'k', {})
+    job = jobqueue.claim('worker-1')
+    jobqueue.fail(job, 'worker-1', 'timeout')
+    assert jobqueue.claim('worker-1') is None
+    clock.advance(jobqueue.RETRY_BASE_DELAY)
+    retried = jobqueue.claim('worker-1')
+    assert retried.attempts == 2
+
+    jobqueue.fail(retried, 'worker-1', 'timeout', retry=False)
+    assert job_rows(database)[('fetch', 'k')]['status'] == 'failed'
+
+
+def test_stage_costs_use_a_high_percentile(database, clock):
+    # 19 quick fetches and one that hit the download deadline
+    for i, seconds in enumerate([1.0] * 19 + [40.0]):
+        jobqueue.enqueue('fetch', f'k{i}', {})
+        job = jobqueue.claim('worker-1')
+        clock.advance(seconds)
+        jobqueue.complete(job, 'worker-1')
+    assert jobqueue.stage_costs(percentile=0.5)['fetch'] == 1.0
+    assert jobqueue.stage_costs(percentile=1.0)['fetch'] == 40.0
+    # Stages without enough timed jobs keep their defaults
+    assert jobqueue.stage_costs()['analyze'] == jobqueue.DEFAULT_STAGE_COSTS['analyze']
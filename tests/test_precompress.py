@@ -0,0 +1,20 @@
+import gzip
+
+import precompress
+
+
+def test_site_gets_feeds_and_compressed_copies(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "feeds" / "tag").mkdir(parents=True)
+    (tmp_path / "output.xml").write_bytes(b"<rss>main</rss>")
+    (tmp_path / "feeds" / "tag" / "ai.json").write_bytes(b'{"items":[]}')
+    (tmp_path / "feeds" / "notes.txt").write_text("not a feed")
+
+    precompress.main(["output.xml", "feeds", "--site", "_site"])
+
+    site = tmp_path / "_site"
+    assert gzip.decompress((site / "output.xml.gz").read_bytes()) == b"<rss>main</rss>"
+    assert (site / "feeds" / "tag" / "ai.json.gz").exists()
+    assert not (site / "feeds" / "notes.txt").exists()
+    # The working tree itself gets no compressed copies
+    assert not (tmp_path / "output.xml.gz").exists()
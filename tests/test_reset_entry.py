@@ -0,0 +1,37 @@
+import sqlite3
+
+import db
+import jobqueue
+import main
+import reset_entry
+from jobqueue import NextJob
+
+
+def run_to_done(stage, worker_id='worker-1', next_jobs=()):
+    job = jobqueue.claim(worker_id, [stage])
+    assert job is not None
+    assert jobqueue.complete(job, worker_id, next_jobs)
+
+
+def test_reset_entry_lets_the_entry_be_seeded_again(database):
+    entry = {'entry_id': 'entry-1', 'title': 'Morning Brief', 'date': '2026-01-01T00:00:00', 'html': ''}
+    other = {'entry_id': 'entry-10', 'title': 'Evening Brief', 'date': '2026-01-01T00:00:00', 'html': ''}
+    main.seed_jobs('default', entry)
+    main.seed_jobs('default', other)
+    url = 'https://example.com/story'
+    context = {'feed_entry_id': 'entry-1', 'email_source': 'Morning Brief', 'feed_source_date': None}
+    # Drive the entry's chain to done: finished jobs keep no payload
+    run_to_done('discover', next_jobs=[NextJob('fetch', url, {'url': url, 'context': context})])
+    run_to_done('fetch')
+    db.save_article({'feed_entry_id': 'entry-1', 'title': 'Story', 'original_link': url, 'content_hash': 'h'})
+
+    reset_entry.reset_entry('entry-1', database)
+
+    conn = sqlite3.connect(database)
+    keys = conn.execute("SELECT stage, job_key FROM jobs ORDER BY id").fetchall()
+    conn.close()
+    # Only whole entry ids match: "default entry-10" survives
+    assert keys == [('discover', 'default entry-10')]
+
+    assert jobqueue.enqueue('discover', 'default entry-1', dict(entry, source='default'))
+    assert not db.article_exists(url=url)
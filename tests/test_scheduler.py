@@ -0,0 +1,18 @@
+import jobqueue
+import scheduler
+
+
+def test_budget_admits_a_stage_only_if_its_slowest_job_fits(database, clock):
+    budget = scheduler.RunBudget(100)
+    # Crawls and Gemini calls are planned at their enforced time limits
+    assert budget.costs['fetch'] >= scheduler.STAGE_TIME_LIMITS['fetch']
+    assert budget.costs['analyze'] >= scheduler.STAGE_TIME_LIMITS['analyze']
+
+    assert set(budget.allowed_stages()) == set(jobqueue.STAGES)
+    clock.advance(100 - scheduler.MIN_PUBLISH_RESERVE - scheduler.STAGE_TIME_LIMITS['fetch'] + 1)
+    allowed = budget.allowed_stages()
+    assert 'fetch' not in allowed
+    assert 'store' in allowed
+
+    clock.advance(budget.remaining())
+    assert budget.allowed_stages() == []
@@ -0,0 +1,54 @@
+import gzip
+import json
+import os
+import sqlite3
+
+import db
+
+
+def save(i, content):
+    db.save_article({'title': f'Story {i}', 'summary': 'A story.', 'tags': 'news', 'content': content,
+                     'original_link': f'https://example.com/{i}', 'content_hash': f'hash-{i}'})
+
+
+def test_search_covers_article_text_not_markup(database):
+    save(0, '<div><p>The <strong>senate</strong> passed the <a href="https://budget.example.org/bill">bill</a>.</p></div>')
+    assert db.search_articles('href') == []
+    assert db.search_articles('strong') == []
+    assert db.search_articles('budget') == []
+    [row] = db.search_articles('senate')
+    assert row['snippet'] == 'The [senate] passed the bill.'
+
+
+def test_existing_html_index_is_rebuilt_over_text(database):
+    save(0, '<p>Markup <em>everywhere</em></p>')
+    conn = sqlite3.connect(database)
+    # Simulate an archive indexed before content_text existed
+    conn.execute("UPDATE articles SET content_text = NULL")
+    for trigger in ("articles_fts_insert", "articles_fts_delete", "articles_fts_update"):
+        conn.execute(f"DROP TRIGGER {trigger}")
+    conn.execute("DROP TABLE articles_fts")
+    conn.execute("CREATE VIRTUAL TABLE articles_fts USING fts5(title, summary, tags, author, content,"
+                 " content='articles', content_rowid='id')")
+    conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    assert db.search_articles('em') == []
+    assert [row['title'] for row in db.search_articles('everywhere')] == ['Story 0']
+
+
+def test_snapshot_leaves_out_derived_text(database, tmp_path):
+    save(0, '<p>The senate met.</p>')
+    snapshot_dir = str(tmp_path / "snapshot")
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    with open(os.path.join(snapshot_dir, "articles", "2026-01.jsonl.gz"), 'rb') as f:
+        [row] = [json.loads(line) for line in gzip.decompress(f.read()).splitlines()]
+    assert 'content_text' not in row
+
+    rebuilt = str(tmp_path / "rebuilt.db")
+    db.import_snapshot(snapshot_dir, rebuilt)
+    conn = sqlite3.connect(rebuilt)
+    assert conn.execute("SELECT content_text FROM articles").fetchone()[0] == 'The senate met.'
+    conn.close()
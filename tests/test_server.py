@@ -0,0 +1,51 @@
+import db
+import feed
+import server
+import sources
+
+
+def add_articles(count):
+    for i in range(count):
+        db.save_article({
+            'title': f'Story {i}', 'original_link': f'https://example.com/{i}', 'content_hash': f'hash-{i}',
+            'summary': 'A story.', 'tags': 'ai', 'content': '<p>Body</p>', 'article_source_domain': 'example.com',
+        })
+        db.link_article_source(f'https://example.com/{i}', 'default', f'entry-{i}')
+
+
+def test_views_hold_exactly_the_requested_number_of_items(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    add_articles(30)
+    cache = server.FeedCache()
+    cache.refresh()
+    for limit in (1, 10, 11, 24, 25, 26):
+        assert cache.get(limit).body.count(b'<item>') == limit
+    assert cache.get(11, 'ai').body.count(b'<item>') == 11
+
+    # The default view is the default source's published output.xml
+    source_list = sources.load_sources()
+    specs = feed.plan_feeds([], db.get_source_feed_rows(limit=50), source_list, sources.load_topic_feeds())
+    feed.publish_feeds(specs, formats=("rss",))
+    assert cache.get(50).body == (tmp_path / source_list[0]['output']).read_bytes()
+
+
+def test_default_view_leaves_out_other_sources(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    add_articles(3)
+    db.save_article({'title': 'Elsewhere', 'original_link': 'https://example.com/other', 'content_hash': 'other',
+                     'summary': 'Another story.', 'tags': 'ai', 'content': '<p>Body</p>'})
+    db.link_article_source('https://example.com/other', 'other-inbox')
+    cache = server.FeedCache()
+    assert cache.get(50).body.count(b'<item>') == 3
+    assert cache.get(50, 'ai').body.count(b'<item>') == 4
+
+
+def test_nearby_limits_share_one_query(database, monkeypatch):
+    add_articles(30)
+    cache = server.FeedCache()
+    queried = []
+    render_items = server.render_items
+    monkeypatch.setattr(server, "render_items", lambda bucket, tag=None: queried.append(bucket) or render_items(bucket, tag))
+    for limit in range(11, 26):
+        cache.get(limit)
+    assert queried == [25]
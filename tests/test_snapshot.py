@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+
+import db
+import jobqueue
+from jobqueue import NextJob
+
+
+def add_article(i):
+    db.save_article({
+        'feed_entry_id': f'entry-{i}',
+        'email_source': 'Morning Brief',
+        'article_source_domain': 'example.com',
+        'title': f'Senate passes budget {i}',
+        'content': f'<p>The senate voted on budget number {i}.</p>',
+        'summary': 'A vote.',
+        'tags': 'politics,budget',
+        'original_link': f'https://example.com/{i}',
+        'content_hash': f'hash-{i}',
+    })
+    db.mark_entry_processed(f'entry-{i}')
+    db.link_article_source(f'https://example.com/{i}', 'default', f'entry-{i}')
+
+
+def query(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_round_trip_rebuilds_articles_and_search(database, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    for i in range(3):
+        add_article(i)
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    for i in range(3, 5):
+        add_article(i)
+    exported = db.export_snapshot(snapshot_dir, period="2026-02")
+    assert exported['articles'] == 2
+
+    rebuilt = str(tmp_path / "rebuilt.db")
+    loaded = db.import_snapshot(snapshot_dir, rebuilt)
+    assert loaded['articles'] == 5
+
+    columns = "id, title, content, tags, original_link, content_hash"
+    assert query(rebuilt, f"SELECT {columns} FROM articles ORDER BY id") == \
+        query(database, f"SELECT {columns} FROM articles ORDER BY id")
+    assert query(rebuilt, "SELECT count(*) FROM entries")[0][0] == 5
+    assert query(rebuilt, "SELECT count(*) FROM article_sources")[0][0] == 5
+    assert query(rebuilt, "SELECT count(*) FROM articles_fts WHERE articles_fts MATCH 'senate'")[0][0] == 5
+
+
+def test_nothing_new_appends_nothing(database, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    add_article(0)
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    changeset = os.path.join(snapshot_dir, "articles", "2026-01.jsonl.gz")
+    size = os.path.getsize(changeset)
+    assert db.export_snapshot(snapshot_dir, period="2026-01")['articles'] == 0
+    assert os.path.getsize(changeset) == size
+
+
+def test_interrupted_append_is_ignored_and_overwritten(database, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    add_article(0)
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    changeset = os.path.join(snapshot_dir, "articles", "2026-01.jsonl.gz")
+    committed = os.path.getsize(changeset)
+
+    # An export that died mid-append, before the manifest was rewritten
+    with open(changeset, 'ab') as f:
+        f.write(b'\x1f\x8b\x08\x00 half a gzip member')
+
+    rebuilt = str(tmp_path / "rebuilt.db")
+    assert db.import_snapshot(snapshot_dir, rebuilt)['articles'] == 1
+
+    # The next export cuts the file back before appending
+    add_article(1)
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    os.remove(rebuilt)
+    assert db.import_snapshot(snapshot_dir, rebuilt)['articles'] == 2
+    with open(os.path.join(snapshot_dir, db.SNAPSHOT_MANIFEST)) as f:
+        assert json.load(f)['files']['articles/2026-01.jsonl.gz'] == os.path.getsize(changeset) > committed
+
+
+def test_unfinished_jobs_are_exported_as_seeds(database, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    entry = {'entry_id': 'entry-9', 'title': 'Morning Brief', 'date': '2026-01-01T00:00:00',
+             'html': '<a href="https://example.com/9">x</a>' * 1000, 'source': 'default'}
+    jobqueue.enqueue('discover', 'default entry-9', entry)
+    db.mark_entry_processed('entry-9')
+    context = {'feed_entry_id': 'entry-8', 'email_source': 'Morning Brief', 'feed_source_date': None}
+    jobqueue.enqueue('fetch', 'https://example.com/8', {'url': 'https://example.com/8', 'context': context})
+    job = jobqueue.claim('worker-1', ['fetch'])
+    jobqueue.complete(job, 'worker-1', [NextJob('extract', 'https://example.com/8',
+                                                {'url': 'https://example.com/8', 'context': context,
+                                                 'html': '<p>page</p>' * 10000})])
+    jobqueue.enqueue('fetch', 'https://example.com/7', {'url': 'https://example.com/7', 'context': context})
+    failed = jobqueue.claim('worker-1', ['fetch'])
+    jobqueue.fail(failed, 'worker-1', 'gone', retry=False)
+
+    db.export_snapshot(snapshot_dir, period="2026-01")
+    assert os.path.getsize(os.path.join(snapshot_dir, db.SNAPSHOT_JOBS)) < 2000
+
+    rebuilt = str(tmp_path / "rebuilt.db")
+    db.import_snapshot(snapshot_dir, rebuilt)
+    jobs = query(rebuilt, "SELECT stage, job_key, status, payload FROM jobs ORDER BY id")
+    # The extract job is back to a fetch of its URL, with the email context;
+    # the failed fetch is gone and the email is left for seeding to queue again
+    assert [(stage, key, status) for stage, key, status, _ in jobs] == [
+        ('fetch', 'https://example.com/8', 'pending'),
+    ]
+    assert json.loads(jobs[0][3]) == {'url': 'https://example.com/8', 'context': context}
+    assert query(rebuilt, "SELECT count(*) FROM entries WHERE entry_id = 'entry-9'")[0][0] == 0
+
+
+def test_job_seeds_are_capped(database, tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "SNAPSHOT_MAX_JOBS", 3)
+    for i in range(5):
+        jobqueue.enqueue('fetch', f'https://example.com/{i}', {'url': f'https://example.com/{i}'}, priority=i)
+    snapshot_dir = str(tmp_path / "snapshot")
+    assert db.export_snapshot(snapshot_dir, period="2026-01")['jobs'] == 3
+    rebuilt = str(tmp_path / "rebuilt.db")
+    db.import_snapshot(snapshot_dir, rebuilt)
+    assert query(rebuilt, "SELECT job_key FROM jobs ORDER BY priority DESC") == [
+        ('https://example.com/4',), ('https://example.com/3',), ('https://example.com/2',),
+    ]
@@ -0,0 +1,34 @@
+import numpy as np
+
+import db
+import spam_model
+
+
+class RecordingModel:
+    threshold = 0.0
+
+    def __init__(self):
+        self.seen = []
+
+    def log_odds(self, feature_ids):
+        self.seen.append(feature_ids)
+        return 0.0
+
+
+def test_scoring_sees_the_same_features_as_training(database, monkeypatch):
+    content = '<div><p>Subscribe <strong>now</strong> for 50% off!</p><p>Limited offer.</p></div>'
+    db.save_article({'title': 'Deal', 'content': content, 'article_source_domain': 'shop.example.com',
+                     'tags': 'spam', 'original_link': 'https://shop.example.com/deal', 'content_hash': 'h'})
+    [(trained, is_spam, _)] = spam_model.load_examples()
+    assert is_spam
+
+    model = RecordingModel()
+    monkeypatch.setattr(spam_model, "get_model", lambda: model)
+    spam_model.spam_score('Deal', content, 'shop.example.com')
+    np.testing.assert_array_equal(model.seen[0], trained)
+
+
+def test_single_held_out_hit_does_not_enable_skipping():
+    scores = np.array([5.0, 1.0, 0.0, -1.0])
+    labels = np.array([True, False, False, False])
+    assert spam_model.choose_threshold(scores, labels) == float('inf')
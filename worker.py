@@ -0,0 +1,142 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import db
+import jobqueue
+import pipeline
+import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle worker sleeps before looking for jobs again
+POLL_INTERVAL = 2.0
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def run_job(job, worker_id, lease_seconds=jobqueue.LEASE_SECONDS):
+    """Runs one claimed job through its stage handler and records the outcome."""
+    handler = pipeline.HANDLERS.get(job.stage)
+    if handler is None:
+        jobqueue.fail(job, worker_id, f"unknown stage: {job.stage}", retry=False)
+        return False
+    try:
+        with jobqueue.Heartbeat(job, worker_id, lease_seconds):
+            next_jobs = handler(job)
+    except Exception as e:
+        logger.error(f"Job {job.id} ({job.stage} {job.key}) failed on attempt {job.attempts}/{job.max_attempts}: {e}")
+        jobqueue.fail(job, worker_id, e)
+        return False
+    return jobqueue.complete(job, worker_id, next_jobs)
+
+def run_worker(stages=jobqueue.STAGES, lease_seconds=jobqueue.LEASE_SECONDS, wait=False, stop_event=None,
+               budget=None):
+    """
+    Claims and runs jobs until none are left. Without wait, the worker exits
+    once nothing is runnable and no other worker is still running a job that
+    could hand it more work; with wait, it polls until stop_event is set.
+    With a scheduler.RunBudget, only stages that still fit the budget are
+    claimed, and the worker exits when none do.
+    Returns the number of jobs completed.
+    """
+    worker_id = make_worker_id()
+    completed = 0
+    while not (stop_event and stop_event.is_set()):
+        claimable = budget.allowed_stages(stages) if budget else stages
+        if not claimable:
+            logger.info("Run budget exhausted; leaving remaining jobs for the next run")
+            break
+        job = jobqueue.claim(worker_id, claimable, lease_seconds)
+        if job is None:
+            if not wait and not jobqueue.has_runnable_or_running(claimable, running_stages=stages):
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        if run_job(job, worker_id, lease_seconds):
+            completed += 1
+    return completed
+
+def run_threads(count, stages=jobqueue.STAGES, lease_seconds=jobqueue.LEASE_SECONDS, wait=False, stop_event=None,
+                budget=None):
+    """Runs count workers as threads of this process and waits for them to finish. Returns jobs completed."""
+    completed = []
+    def target():
+        completed.append(run_worker(stages, lease_seconds, wait, stop_event, budget))
+    threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(completed)
+
+def print_stats():
+    counts = jobqueue.stats()
+    print(f"{'stage':10}{'pending':>10}{'running':>10}{'done':>10}{'failed':>10}")
+    for stage in jobqueue.STAGES:
+        row = counts.get(stage, {})
+        print(f"{stage:10}" + "".join(f"{row.get(status, 0):>10}" for status in ('pending', 'running', 'done', 'failed')))
+
+def main(argv=None):
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Run pipeline workers against the job queue.")
+    parser.add_argument("--stages", default=",".join(jobqueue.STAGES),
+                        help="Comma-separated stages to work on (default: all)")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start")
+    parser.add_argument("--threads", type=int, default=4, help="Worker threads per process")
+    parser.add_argument("--lease", type=int, default=jobqueue.LEASE_SECONDS,
+                        help="Seconds a job stays leased without a heartbeat")
+    parser.add_argument("--wait", action="store_true", help="Keep polling for new jobs instead of exiting when idle")
+    parser.add_argument("--status", action="store_true", help="Print job counts per stage and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue failed jobs, then run")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        help="Stop claiming jobs that would not finish within this many seconds")
+    parser.add_argument("--purge-done", type=float, metavar="DAYS",
+                        help="Delete finished jobs older than DAYS, then exit")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    if args.status:
+        print_stats()
+        return 0
+    if args.purge_done is not None:
+        print(f"Purged {jobqueue.purge_done(args.purge_done * 24 * 3600)} finished jobs")
+        return 0
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(jobqueue.STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.retry_failed:
+        logger.info(f"Requeued {jobqueue.retry_failed(stages)} failed jobs")
+
+    budget = scheduler.RunBudget(args.budget) if args.budget else None
+    if args.processes <= 1:
+        run_threads(args.threads, stages, args.lease, args.wait, budget=budget)
+        return 0
+
+    processes = [
+        multiprocessing.Process(target=run_threads, args=(args.threads, stages, args.lease, args.wait),
+                                kwargs={'budget': budget})
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())